@@ -1,6 +1,7 @@
 import os
 import sys
-import imp
+import threading
+from collections import OrderedDict
 try:
     # Django versions >= 1.9
     from django.utils.module_loading import import_module
@@ -13,9 +14,7 @@ from django_datatables.widgets import *
 from django_datatables.fields import *
 from django_datatables.writers import *
 
-# A cache of loaded reports, so that get_reports
-# doesn't have to reload every time it's called.
-_reports = None
+default_app_config = 'django_datatables.apps.DatatablesConfig'
 
 def find_reports(report_dir):
     """
@@ -33,37 +32,110 @@ def find_reports(report_dir):
 
 def find_report_module(app_name):
     """
-    Determines the path to the reports module for the given app_name,
-    without actually importing the application or the management module.
+    Determines the path to the package of the given app_name. Installed apps
+    have already been imported by Django, so this is a lookup in
+    sys.modules rather than a walk of sys.path.
 
-    Raises ImportError if the reports module cannot be found for any reason.
+    Raises ImportError if the app cannot be found for any reason.
+    """
+    module = import_module(app_name)
+    return os.path.dirname(module.__file__)
+
+def installed_apps():
+    """
+    Return a list of (app_name, path) tuples for the installed apps.
     """
-    parts = app_name.split('.')
-    parts.reverse()
-    part = parts.pop()
-    path = None
-
-    # When using manage.py, the project module is added to the path,
-    # loaded, then removed from the path. This means that
-    # testproject.testapp.models can be loaded in future, even if
-    # testproject isn't in the path. When looking for the management
-    # module, we need look for the case where the project name is part
-    # of the app_name but the project directory itself isn't on the path.
     try:
-        f, path, descr = imp.find_module(part, path)
-    except ImportError as e:
-        if os.path.basename(os.getcwd()) != part:
-            raise e
-    else:
-        if f:
-            f.close()
-
-    while parts:
-        part = parts.pop()
-        f, path, descr = imp.find_module(part, path and [path] or None)
-        if f:
-            f.close()
-    return path
+        # Django versions >= 1.7
+        from django.apps import apps
+    except ImportError:
+        # Django versions < 1.7
+        paths = []
+        for app_name in settings.INSTALLED_APPS:
+            try:
+                paths.append((app_name, find_report_module(app_name)))
+            except ImportError:
+                pass
+        return paths
+    return [(config.name, config.path) for config in apps.get_app_configs()]
+
+class ReportRegistry(object):
+    """
+    An index of the reports of the installed apps.
+
+    The index is built once by listing the reports package of each app - no
+    report module is imported until its class is requested, and each is
+    imported once.
+    """
+    def __init__(self):
+        self._index = None
+        self._classes = {}
+        self._lock = threading.RLock()
+
+    def populate(self):
+        """
+        Build the index if it hasn't been built. Called from
+        DatatablesConfig.ready() and lazily on first use.
+        """
+        if self._index is not None:
+            return
+        with self._lock:
+            if self._index is not None:
+                return
+            index = OrderedDict()
+            for app_name, path in installed_apps():
+                for name in sorted(find_reports(path)):
+                    index['%s.reports.%s.Report' % (app_name, name)] = (name, app_name)
+            self._index = index
+
+    def index(self):
+        """
+        Return an ordered dict of {report key: (report_name, app_name)}.
+        """
+        self.populate()
+        return self._index
+
+    def get_class(self, app_name, name):
+        """
+        Return the Report class for name in app_name. All errors raised by
+        the import process (ImportError, AttributeError) are allowed to
+        propagate.
+        """
+        key = (app_name, name)
+        try:
+            return self._classes[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._classes:
+                self._classes[key] = import_module('%s.reports.%s' % (app_name, name)).Report
+            return self._classes[key]
+
+    def classes(self):
+        """
+        Yield (report key, report_name, app_name, Report class) for each
+        report that imports and defines a Report.
+        """
+        for key, (name, app_name) in self.index().iteritems():
+            try:
+                report_class = self.get_class(app_name, name)
+            except (AttributeError, ImportError):
+                continue
+            if isinstance(report_class, type) and issubclass(report_class, Report):
+                yield key, name, app_name, report_class
+
+    def clear(self):
+        with self._lock:
+            self._index = None
+            self._classes = {}
+
+registry = ReportRegistry()
+
+def get_report_class(app_name, name):
+    """
+    Given a name and an application name, returns the Report class.
+    """
+    return registry.get_class(app_name, name)
 
 def load_report_class(app_name, name):
     """
@@ -71,48 +143,24 @@ def load_report_class(app_name, name):
     class instance. All errors raised by the import process
     (ImportError, AttributeError) are allowed to propagate.
     """
-    return import_module('%s.reports.%s' % (app_name, name)).Report()
+    return get_report_class(app_name, name)()
 
 def get_reports():
     """
     Returns a dictionary mapping report names to their callbacks.
 
     This works by looking for a reports package in each installed application -- 
-    if a reports package exists, all reports in that package are registered.
+    all modules in a reports package that import and define a Report are
+    registered.
 
-    The dictionary is in the format {report_name: app_name}. Key-value
-    pairs from this dictionary can then be used in calls to
+    The dictionary is in the format {report_key: (report_name, app_name)}.
+    Values from this dictionary can then be used in calls to
     load_report_class(app_name, report_name)
 
-    The dictionary is cached on the first call and reused on subsequent
-    calls.
+    The report classes are imported on the first call and reused on
+    subsequent calls.
     """
-    global _reports
-    if _reports is None:
-        _reports = dict()
-        
-        # Find the installed apps
-        from django.conf import settings
-        apps = settings.INSTALLED_APPS
-
-        # Find and load the reports for each installed app.
-        for app_name in apps:
-            try:
-                path = find_report_module(app_name)
-                for name in find_reports(path):
-                    try:
-                        report = load_report_class(app_name, name)
-                        if isinstance(report, Report):
-                            # Ensure that our report class extends ReportBase
-                            _reports.update(dict([('%s.%s' % (report.__module__, report.__class__.__name__), (name, app_name))]))
-                    except AttributeError as e:
-                        pass
-                    except ImportError as e:
-                        pass
-            except ImportError:
-                pass
-
-    return _reports
+    return OrderedDict((key, (name, app_name)) for key, name, app_name, report_class in registry.classes())
 
 class FieldError(Exception):
     """Some kind of problem with a report field."""
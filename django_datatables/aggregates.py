@@ -0,0 +1,210 @@
+from decimal import Decimal
+from django.db.models import Avg, Count, Max, Min, Sum
+from django.db.models.aggregates import Aggregate
+from django.db.models.query import QuerySet
+from django_datatables.utils import resolve_lookup_path, iter_queryset
+
+class Accumulator(object):
+    """
+    Accumulates one aggregate over a stream of values - None is ignored, as
+    it is by the database.
+    """
+    def __init__(self):
+        self.value = None
+
+    def add(self, value):
+        raise NotImplementedError
+
+    def result(self):
+        return self.value
+
+class SumAccumulator(Accumulator):
+    def add(self, value):
+        if value is not None:
+            self.value = value if self.value is None else self.value + value
+
+class AvgAccumulator(Accumulator):
+    def __init__(self):
+        self.value = None
+        self.count = 0
+
+    def add(self, value):
+        if value is not None:
+            self.value = value if self.value is None else self.value + value
+            self.count += 1
+
+    def result(self):
+        if not self.count:
+            return None
+        if isinstance(self.value, Decimal):
+            return self.value / self.count
+        return float(self.value) / self.count
+
+class MinAccumulator(Accumulator):
+    def add(self, value):
+        if value is not None and (self.value is None or value < self.value):
+            self.value = value
+
+class MaxAccumulator(Accumulator):
+    def add(self, value):
+        if value is not None and (self.value is None or value > self.value):
+            self.value = value
+
+class CountAccumulator(Accumulator):
+    def __init__(self):
+        self.value = 0
+
+    def add(self, value):
+        if value is not None:
+            self.value += 1
+
+class DistinctCountAccumulator(Accumulator):
+    def __init__(self):
+        self.values = set()
+
+    def add(self, value):
+        if value is not None:
+            self.values.add(value)
+
+    def result(self):
+        return len(self.values)
+
+ACCUMULATORS = {
+    'sum': SumAccumulator,
+    'avg': AvgAccumulator,
+    'min': MinAccumulator,
+    'max': MaxAccumulator,
+    'count': CountAccumulator,
+    'distinct_count': DistinctCountAccumulator,
+}
+
+DB_AGGREGATES = {
+    'sum': Sum,
+    'avg': Avg,
+    'min': Min,
+    'max': Max,
+    'count': Count,
+    'distinct_count': lambda lookup: Count(lookup, distinct=True),
+}
+
+def get_function(field):
+    """
+    Return the name of the aggregate function of field - Field.aggregate is
+    True (sum), the name of a function in ACCUMULATORS or a django aggregate
+    (ie.. Sum('amount')).
+    """
+    aggregate = field.aggregate
+    if aggregate is True:
+        return 'sum'
+    if isinstance(aggregate, Aggregate):
+        name = aggregate.__class__.__name__.lower()
+        # Django < 2.0 keeps distinct in extra.
+        distinct = getattr(aggregate, 'distinct', False) or getattr(aggregate, 'extra', {}).get('distinct')
+        if name == 'count' and distinct:
+            return 'distinct_count'
+        return name if name in ACCUMULATORS else None
+    if aggregate in ACCUMULATORS:
+        return aggregate
+    raise ValueError("Unknown aggregate %r for field '%s'" % (aggregate, field.name))
+
+def get_db_aggregate(field, model):
+    """
+    Return the django aggregate for field, or None if it can't be done by
+    the database (ie.. the field's value comes from a method).
+    """
+    if isinstance(field.aggregate, Aggregate):
+        return field.aggregate
+    relations, model_field, many = resolve_lookup_path(model, field.name)
+    if model_field is None:
+        return None
+    return DB_AGGREGATES[get_function(field)](field.name)
+
+class Aggregator(object):
+    """
+    Streams items through an accumulator for each of the report's aggregate
+    fields - so aggregating never needs the whole dataset in memory and can
+    share a pass over the items with a writer.
+    """
+    def __init__(self, report):
+        self.report = report
+        self.accumulators = []
+        self._by_field = {}
+        # Fields whose aggregate only the database can do (ie.. StdDev) - their
+        # results are None.
+        self.skipped = []
+        for field in report._meta.aggregate_fields:
+            function = get_function(field)
+            if function is None:
+                self.skipped.append(field)
+                continue
+            accumulator = ACCUMULATORS[function]()
+            self.accumulators.append((field, accumulator))
+            self._by_field[id(field)] = accumulator
+
+    @classmethod
+    def for_report(cls, report):
+        """
+        Return an Aggregator for report, or None if the report has no
+        aggregates or some can only be done by the database.
+        """
+        fields = report._meta.aggregate_fields
+        if not fields or any(get_function(field) is None for field in fields):
+            return None
+        return cls(report)
+
+    def get_accumulator(self, field):
+        """
+        Return the accumulator of field, or None if it isn't aggregated.
+        """
+        return self._by_field.get(id(field))
+
+    def add_value(self, field, value):
+        """
+        Add the already traversed value of field - see add().
+        """
+        accumulator = self._by_field.get(id(field))
+        if accumulator is not None:
+            accumulator.add(value)
+
+    def add(self, item):
+        for field, accumulator in self.accumulators:
+            value = field.traverse_for_value(item)
+            if callable(value):
+                value = value()
+            accumulator.add(value)
+
+    def results(self):
+        """
+        Return a dict of {field name: aggregate}.
+        """
+        results = dict((field.name, None) for field in self.skipped)
+        results.update((field.name, accumulator.result()) for field, accumulator in self.accumulators)
+        return results
+
+def aggregate(report, items):
+    """
+    Return a dict of {field name: aggregate} for the aggregate fields of
+    report over items. Querysets (including values() querysets) are
+    aggregated by the database when every aggregate can be, anything else is
+    streamed through an Aggregator - aggregates only the database can do are
+    then still done by it for querysets and are None otherwise.
+    """
+    fields = report._meta.aggregate_fields
+    if not fields:
+        return {}
+    if isinstance(items, QuerySet):
+        expressions = {}
+        for field in fields:
+            expression = get_db_aggregate(field, items.model)
+            if expression is None:
+                break
+            expressions[field.name] = expression
+        else:
+            return items.aggregate(**expressions)
+    aggregator = Aggregator(report)
+    for item in iter_queryset(items):
+        aggregator.add(item)
+    results = aggregator.results()
+    if aggregator.skipped and isinstance(items, QuerySet):
+        results.update(items.aggregate(**dict((field.name, field.aggregate) for field in aggregator.skipped)))
+    return results
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+class DatatablesConfig(AppConfig):
+    name = 'django_datatables'
+    verbose_name = 'Datatables'
+
+    def ready(self):
+        from django_datatables import registry
+        registry.populate()
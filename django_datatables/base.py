@@ -9,13 +9,15 @@ from django.utils.translation import string_concat
 from django.utils.text import slugify
 from django_datatables import writers
 from django.core.cache import cache
-from django.db.models import Q
+from django.db.models import Q, Max
+from django_datatables import caching
+from django_datatables.utils import is_model_queryset, resolve_related_lookup, resolve_lookup_path, iter_queryset
 import copy
 get_verbose_name = lambda name: re.sub('(((?<=[a-z])[A-Z])|([A-Z](?![A-Z]|$)))', ' \\1', name).lower().strip()
 
 logger = logging.getLogger(__name__)
 
-DEFAULT_NAMES = ('verbose_name', 'app_label', 'slug', 'description', 'writers', 'cache', 'form_prefix', 'sorting', 'listing')
+DEFAULT_NAMES = ('verbose_name', 'app_label', 'slug', 'description', 'writers', 'cache', 'form_prefix', 'sorting', 'listing', 'auto_related', 'projection', 'batch_data_tips', 'aggregate_cache', 'count', 'keyset', 'materialize', 'search', 'data_version')
 
 class Options():
     def __init__(self, meta, app_label=None):
@@ -28,6 +30,35 @@ class Options():
         self.writers = []
         self.cache = False
         self.listing = False
+        self.auto_related = True
+        self.select_related = ()
+        self.prefetch_related = ()
+        self._related_lookups = {}
+        self.projection = None
+        self.projection_lookups = ()
+        self._projections = {}
+        self.row_plan = None
+        self.batch_data_tips = False
+        self.aggregate_cache = False
+        self.count = None
+        self.keyset = False
+        # Serve the report from snapshots made by the materialize_reports
+        # command. Snapshots are gathered without a request and shared by
+        # every user, so reports whose queryset depends on the request (ie..
+        # override set_request() or cache_vary()) can't be materialized.
+        self.materialize = False
+        self.descriptor = None
+        self.fields_by_name = {}
+        self.field_indexes = {}
+        self.filter_fields = ()
+        self.sorting_fields = ()
+        self.aggregate_fields = ()
+        self.form_fields = ()
+        self.visible_fields = ()
+        self._field_subsets = {}
+        self.search = None
+        self.search_lookups = ()
+        self.data_version = None
 
     def add_field(self, field):
         self.fields.append(field) #insert(bisect(self.fields, field), field)
@@ -69,7 +100,102 @@ class Options():
         del self.meta
 
     def _prepare(self, report):
-        pass
+        # Index the fields once so that lookups by name/attribute don't scan
+        # the fields - reports with many columns do these lookups per cell.
+        self.fields_by_name = dict((field.name, field) for field in self.fields)
+        self.field_indexes = dict((field.name, i) for i, field in enumerate(self.fields))
+        self.filter_fields = tuple(field for field in self.fields if field.filter)
+        self.sorting_fields = tuple(field for field in self.fields if field.sorting)
+        self.aggregate_fields = tuple(field for field in self.fields if field.aggregate)
+        self.visible_fields = tuple(field for field in self.fields if not field.hidden)
+        if self.fields:
+            from django_datatables.fields import BaseFormField
+            self.form_fields = tuple(field for field in self.fields if isinstance(field, BaseFormField))
+        self._field_subsets = {}
+        # The lookups the search backend searches (and indexes).
+        search_lookups = []
+        for field in self.filter_fields:
+            for lookup in field.filter_with or ():
+                if lookup not in search_lookups:
+                    search_lookups.append(lookup)
+        self.search_lookups = tuple(search_lookups)
+
+        # Work out which relations the fields traverse so that querysets can
+        # be joined/prefetched up front rather than once per row.
+        select_related, prefetch_related = [], []
+        for field in self.fields:
+            select, prefetch = field.get_related_lookups()
+            select_related.extend([lookup for lookup in select if lookup not in select_related])
+            prefetch_related.extend([lookup for lookup in prefetch if lookup not in prefetch_related])
+        self.select_related = tuple(select_related)
+        self.prefetch_related = tuple(prefetch_related)
+        self._related_lookups = {}
+
+        if self.keyset and not getattr(self, 'sorting', None):
+            raise TypeError("'class Meta' keyset requires sorting that ends in a unique key")
+        if self.projection not in (None, 'only', 'values'):
+            raise TypeError("'class Meta' projection must be one of None, 'only' or 'values' not %r" % self.projection)
+        # The lookups a projected queryset needs - the rendered fields must
+        # resolve (strict), the sorting/filter lookups are included if they do.
+        projection_lookups = []
+        for field in self.fields:
+            for lookup in field.get_projection_lookups():
+                projection_lookups.append((lookup, True))
+            sorting_with = field.sorting_with if isinstance(field.sorting_with, (list, tuple)) else (field.sorting_with, )
+            for lookup in tuple(sorting_with) + tuple(field.filter_with or ()):
+                if lookup:
+                    projection_lookups.append((lookup.lstrip('-'), False))
+        self.projection_lookups = tuple(projection_lookups)
+        self._projections = {}
+
+    def related_lookups(self, model):
+        """
+        Return a tuple of (select_related, prefetch_related) lookups for model.
+
+        The candidate lookups gathered in _prepare() are resolved against the
+        model's relations once and cached - anything that turns out not to be
+        a relation (ie.. a property or method on the model) is dropped and
+        lookups that cross a to-many relation are prefetched.
+        """
+        if model not in self._related_lookups:
+            select_related, prefetch_related = [], []
+            for lookup in self.select_related + self.prefetch_related:
+                path, many = resolve_related_lookup(model, lookup)
+                lookups = prefetch_related if many else select_related
+                if path and path not in lookups:
+                    lookups.append(path)
+            self._related_lookups[model] = (tuple(select_related), tuple(prefetch_related))
+        return self._related_lookups[model]
+
+    def projected_lookups(self, model):
+        """
+        Return the lookups to pass to only() or values() (depending on
+        Meta.projection) for model, resolved once and cached.
+
+        Lookups that don't resolve to a model field (properties/methods) are
+        dropped for only(). values() can't render those at all, nor relations
+        (it returns their pk) or anything across a to-many relation (it
+        multiplies rows) - a FieldError is raised for such rendered fields.
+        """
+        from django_datatables import FieldError
+        if model not in self._projections:
+            lookups = ['pk'] if self.projection == 'values' else []
+            for lookup, strict in self.projection_lookups:
+                relations, field, many = resolve_lookup_path(model, lookup)
+                if self.projection == 'values':
+                    valid = field is not None and not many and not field.is_relation
+                    if not valid and strict:
+                        raise FieldError("Field '%s' can't be projected with values() for model '%s'." % (lookup, model.__name__))
+                    candidates = [lookup] if valid else []
+                else:
+                    # Only forward relations are joined, everything else is
+                    # deferred on the related model anyway.
+                    if field is None or many or (field.is_relation and (field.many_to_many or field.one_to_many or not field.concrete)):
+                        continue
+                    candidates = relations + [lookup]
+                lookups.extend([candidate for candidate in candidates if candidate not in lookups])
+            self._projections[model] = tuple(lookups)
+        return self._projections[model]
 
 class ReportBase(type):
     """
@@ -172,6 +298,46 @@ class ReportBase(type):
         for writer in cls._meta.writers:
             setattr(cls._meta, 'supports_%s_writer' % writer.__name__, True)
 
+class ReportDescriptor(object):
+    """
+    Everything a view needs to know about a report class, resolved once: the
+    fields, the field index, the supported writers and the order columns.
+
+    A descriptor is built once per report class (see
+    ReportDescriptor.for_report_class) so a request only has to create the
+    report instance itself.
+    """
+    def __init__(self, report_class):
+        self.report_class = report_class
+        self.fields = tuple(report_class._meta.fields)
+        self.field_index = report_class._meta.field_indexes
+        self.writers = frozenset(writer.__name__ for writer in report_class._meta.writers)
+        self.order_columns = tuple(field.sorting_with for field in self.fields)
+
+    @classmethod
+    def for_report_class(cls, report_class):
+        """
+        Return the (cached) descriptor for report_class.
+        """
+        if report_class._meta.descriptor is None:
+            report_class._meta.descriptor = cls(report_class)
+        return report_class._meta.descriptor
+
+    def field(self, name):
+        """
+        Retrieve a field by its name, or None.
+        """
+        return self.report_class._meta.fields_by_name.get(name)
+
+    def supports_writer(self, writer):
+        return (writer if isinstance(writer, basestring) else writer.__name__) in self.writers
+
+    def report(self):
+        """
+        Return a new instance of the report.
+        """
+        return self.report_class()
+
 class Report(six.with_metaclass(ReportBase, object)):
     
     def __init__(self, request=None):
@@ -187,6 +353,32 @@ class Report(six.with_metaclass(ReportBase, object)):
         """
         self._raiseNotImplementedError('method', 'queryset')
 
+    def prepare_queryset(self, qs):
+        """
+        Apply the select_related/prefetch_related plan for this report to qs.
+
+        If Meta.projection is 'only' or 'values' then only the columns the
+        report renders, sorts and filters with are fetched - with 'values' rows
+        come back as dicts rather than model instances.
+
+        Anything that isn't a model queryset (ie.. a list of items) is returned
+        untouched. Set Meta.auto_related to False to skip the related plan.
+        """
+        if not is_model_queryset(qs):
+            return qs
+        if self._meta.projection == 'values':
+            return qs.values(*self._meta.projected_lookups(qs.model))
+        if self._meta.auto_related:
+            select_related, prefetch_related = self._meta.related_lookups(qs.model)
+            # select_related() with no arguments already follows every relation.
+            if select_related and qs.query.select_related is not True:
+                qs = qs.select_related(*select_related)
+            if prefetch_related:
+                qs = qs.prefetch_related(*prefetch_related)
+        if self._meta.projection == 'only':
+            qs = qs.only(*self._meta.projected_lookups(qs.model))
+        return qs
+
     def fields(self, attr=None, value=None):
         """
         Return a list of fields optionally filtering the list using attr=value
@@ -197,25 +389,34 @@ class Report(six.with_metaclass(ReportBase, object)):
         """
         fields = self._meta.fields
         if attr:
-            return [field for field in fields if getattr(field, attr) == value]
+            key = (attr, value)
+            try:
+                return self._meta._field_subsets[key]
+            except KeyError:
+                subset = self._meta._field_subsets[key] = [field for field in fields if getattr(field, attr) == value]
+                return subset
+            except TypeError:
+                # An unhashable value - can't be cached.
+                return [field for field in fields if getattr(field, attr) == value]
         return fields 
     
     def field(self, name):
         """
         Retrieve a field by its name.
         """
-        for field in self.fields():
-            if field.name == name:
-                return field
+        return self._meta.fields_by_name.get(name)
 
     def field_exists(self, name):
-        return self.field(name) is not None
+        return name in self._meta.fields_by_name
 
     def field_index(self, name):
         """
         Retrieve the field index by field name.
         """
-        return self.fields().index(self.field(name))
+        try:
+            return self._meta.field_indexes[name]
+        except KeyError:
+            raise ValueError("'%s' is not a field of report '%s'" % (name, self.__class__.__name__))
     
     def titles(self):
         """
@@ -233,19 +434,75 @@ class Report(six.with_metaclass(ReportBase, object)):
         """
         Return True if writer is supported by this report.
         """
-        writers = self.writers()
-        if isinstance(writer, basestring):
-            writers = [_writer.__class__.__name__ for _writer in writers]
-        return writer in writers
+        name = writer if isinstance(writer, basestring) else writer.__name__
+        return getattr(self._meta, 'supports_%s_writer' % name, False)
 
-    def cache_key(self):
+    def cache_key(self, *parts):
         """
-        Return a cache key for this report.
+        Return a cache key for this report - parts make the key unique for
+        anything the cached value depends on (ie.. the request).
         """
-        return 'report-%s' % self.__class__.__name__
+        return caching.make_key(self.cache_namespace(), *parts)
+
+    def cache_namespace(self):
+        """
+        Return the prefix shared by every cache key of this report.
+        """
+        return 'report-%s.%s' % (self.__module__, self.__class__.__name__)
+
+    def cache_version(self):
+        """
+        Return the version of this report's cached data - it changes every
+        time delete_cache() is called.
+        """
+        return caching.get_version(self.cache_namespace())
+
+    def data_version(self):
+        """
+        Return a cheap value that changes whenever the report's data changes,
+        or None if the report doesn't declare one with Meta.data_version:
+
+        - True uses the cache version (bumped by delete_cache()).
+        - A lookup (ie.. 'updated') uses MAX(lookup) over the queryset.
+        - A callable is called with the report.
+        """
+        version = self._meta.data_version
+        if version is None or version is False:
+            return None
+        if version is True:
+            return self.cache_version()
+        if callable(version):
+            return version(self)
+        return self.queryset().aggregate(data_version=Max(version))['data_version']
+
+    def cache_vary(self):
+        """
+        Return the parts of the request that cached results depend on. By
+        default results are cached per user, override this to cache per
+        tenant etc.
+        """
+        user = getattr(getattr(self, 'request', None), 'user', None)
+        if user is not None and user.is_authenticated():
+            return (user.pk, )
+        return (None, )
+
+    def cache_hit(self, hit):
+        """
+        Record a hit (or a miss) on this report's cache.
+        """
+        caching.increment('%s-%s' % (self.cache_namespace(), 'hits' if hit else 'misses'))
+
+    def cache_stats(self):
+        """
+        Return the number of hits and misses on this report's cache.
+        """
+        namespace = self.cache_namespace()
+        return {'hits': cache.get('%s-hits' % namespace, 0),
+                'misses': cache.get('%s-misses' % namespace, 0)}
 
     def delete_cache(self):
         cache.delete(self.cache_key())
+        caching.bump_version(self.cache_namespace())
 
     def data(self):
         """
@@ -254,11 +511,13 @@ class Report(six.with_metaclass(ReportBase, object)):
         if hasattr(self, '_data'):
             return self._data
         if self._meta.cache:
-            # Check if the data exists in cache
-            self._data = cache.get(self.cache_key())
-            if not self._data:
-                self._data = self._gather_data()
-                cache.set(self.cache_key(), self._data, self._meta.cache.seconds)
+            # Serve stale data for up to Meta.cache.stale_seconds while a
+            # single worker gathers it again.
+            self._data, hit = caching.get_or_compute(self.cache_key(), self._gather_data,
+                                                     self._meta.cache.seconds,
+                                                     getattr(self._meta.cache, 'stale_seconds', 0),
+                                                     getattr(self._meta.cache, 'lock_seconds', 60))
+            self.cache_hit(hit)
         else:
             self._data = self._gather_data()
         return self._data
@@ -275,32 +534,49 @@ class Report(six.with_metaclass(ReportBase, object)):
         @return list: A list of dicts with field names forming the dict keys.
         """
         rows = []
-        for item in self.queryset():
+        for item in iter_queryset(self.prepare_queryset(self.queryset())):
             row = {}
             for field in self.fields():
-                at = getattr(item, field.name)
+                at = field.traverse_for_value(item)
                 row[field.name] = at() if callable(at) else at
             rows.append(row)
         return rows
 
     def has_aggregates(self):
-        return len([field for field in self.fields() if field.aggregate]) > 0
+        return len(self._meta.aggregate_fields) > 0
     
     def get_aggregates(self):
+        """
+        Return a dict of {field name: aggregate} for the aggregate fields -
+        see django_datatables.aggregates. Cached data (Meta.cache) is
+        aggregated as is, otherwise the queryset is aggregated by the
+        database or streamed.
+        """
+        from django_datatables.aggregates import aggregate
         if not self.has_aggregates():
             return None
         if hasattr(self, '_aggregates'):
             return self._aggregates
-        self._aggregates = {}
-        aggregate_fields = [field for field in self.fields() if field.aggregate]
-        for item in self.data():
-            for field in aggregate_fields:
-                if not field.name in self._aggregates:
-                    self._aggregates[field.name] = item[field.name]
-                else:
-                    self._aggregates[field.name] += item[field.name]
+        if hasattr(self, '_data') or self._meta.cache:
+            items = self.data()
+        else:
+            items = self.prepare_queryset(self.queryset())
+        self._aggregates = aggregate(self, items)
         return self._aggregates
     
+    def search(self, qs, term):
+        """
+        Filter qs by term using the report's search backend (Meta.search,
+        ContainsSearch by default).
+        """
+        if not term:
+            return qs
+        from django_datatables.search import ContainsSearch
+        backend = self._meta.search or ContainsSearch
+        if isinstance(backend, type):
+            backend = backend()
+        return backend.search(self, qs, term)
+
     def get_qs_for_term(self, term):
         """
         Get a queryset object that uses term to filter the entire report.
@@ -309,7 +585,7 @@ class Report(six.with_metaclass(ReportBase, object)):
             return None
         
         qs_params = None
-        for field in self.fields('filter', True):
+        for field in self._meta.filter_fields:
             q = field.get_qs_for_term(term)
             if q:
                 qs_params = qs_params | q if qs_params else q
@@ -0,0 +1,88 @@
+import time
+import hashlib
+from django.core.cache import cache
+
+def make_key(prefix, *parts):
+    """
+    Return a cache key for prefix that is unique for parts. The parts are
+    hashed so the key is always short enough (and safe) for memcached.
+    """
+    return '%s-%s' % (prefix, hashlib.md5(repr(parts)).hexdigest())
+
+def query_signature(qs):
+    """
+    Return a str identifying the SQL of qs, for use in keys. The SQL and its
+    params are repr()'d rather than interpolated so non-ASCII terms are
+    safe. Raises EmptyResultSet for querysets that can't match anything.
+    """
+    return repr(qs.query.sql_with_params())
+
+def get_version(namespace):
+    """
+    Return the current version of namespace. Keys that include the version
+    are invalidated all at once by bump_version().
+    """
+    key = '%s-version' % namespace
+    version = cache.get(key)
+    if version is None:
+        # Start from the time rather than 1 so that an evicted version can't
+        # bring back keys from before it was evicted.
+        cache.add(key, int(time.time()), None)
+        version = cache.get(key, int(time.time()))
+    return version
+
+def bump_version(namespace):
+    """
+    Invalidate every key built with the current version of namespace.
+    """
+    key = '%s-version' % namespace
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time()), None)
+
+def increment(key):
+    """
+    Increment the counter stored at key, creating it if needed.
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+def get_or_compute(key, compute, seconds, stale_seconds=0, lock_seconds=60, poll=0.1):
+    """
+    Return a tuple of (value, hit) for the value cached at key, calling
+    compute() to produce it when needed.
+
+    Values go stale after seconds but are kept for another stale_seconds.
+    Only one worker at a time (whoever holds the lock, taken with cache.add)
+    recomputes a value - while it does, everyone else is served the stale
+    value or, if there isn't one, waits up to lock_seconds for it.
+    """
+    lock_key = '%s-lock' % key
+    envelope = cache.get(key)
+    if not isinstance(envelope, dict) or 'stale_at' not in envelope:
+        envelope = None
+    if envelope is not None:
+        if time.time() < envelope['stale_at'] or not cache.add(lock_key, 1, lock_seconds):
+            # Still fresh, or stale and somebody else is refreshing it.
+            return envelope['value'], True
+        locked = True
+    else:
+        deadline = time.time() + lock_seconds
+        locked = cache.add(lock_key, 1, lock_seconds)
+        while not locked and time.time() < deadline:
+            time.sleep(poll)
+            envelope = cache.get(key)
+            if isinstance(envelope, dict) and 'value' in envelope:
+                return envelope['value'], True
+            locked = cache.add(lock_key, 1, lock_seconds)
+    try:
+        value = compute()
+        cache.set(key, {'value': value, 'stale_at': time.time() + seconds}, seconds + stale_seconds)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return value, False
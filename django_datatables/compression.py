@@ -0,0 +1,97 @@
+import re
+import gzip
+import zlib
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# The file name suffix of each compression.
+SUFFIXES = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+def accepts_gzip(request):
+    """
+    Return True if request's Accept-Encoding allows a gzip encoded response.
+    An explicit gzip entry takes precedence over '*' and a malformed quality
+    counts as not accepted.
+    """
+    qualities = {}
+    for encoding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        parts = encoding.strip().split(';')
+        name = parts[0].strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        match = re.search(r'q\s*=\s*([^;\s]*)', ';'.join(parts[1:]))
+        if match is not None:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                quality = 0
+        qualities[name] = quality
+    return qualities.get('gzip', qualities.get('*', 0)) > 0
+
+def gzip_iter(chunks, level=6):
+    """
+    Compress an iterable of strings as one gzip stream, a chunk at a time -
+    ie.. for a StreamingHttpResponse.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+class CompressedWriter(object):
+    """
+    A file like object that compresses everything written to it into handle.
+
+    Output is written as a series of independently decodable members (gzip
+    members/zstd frames, which decompress as one stream) - after
+    finish_member() handle can be truncated at its current position and
+    appended to later, which is what makes exports resumable.
+    """
+    def __init__(self, handle, compression=None, level=None):
+        if compression not in (None, ) + tuple(SUFFIXES):
+            raise ValueError("Unknown compression '%s'" % compression)
+        if compression == 'zstd' and zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        self.handle = handle
+        self.compression = compression
+        self.level = level
+        self.stream = None
+
+    def _open(self):
+        if self.compression == 'gzip':
+            return gzip.GzipFile(fileobj=self.handle, mode='wb', compresslevel=self.level or 6)
+        if self.compression == 'zstd':
+            return zstandard.ZstdCompressor(level=self.level or 3).stream_writer(self.handle)
+        return self.handle
+
+    def write(self, data):
+        if self.stream is None:
+            self.stream = self._open()
+        self.stream.write(data)
+
+    def finish_member(self):
+        """
+        End the current member and flush it to handle.
+        """
+        if self.stream is not None:
+            if self.compression == 'gzip':
+                self.stream.close()
+                self.stream = None
+            elif self.compression == 'zstd':
+                self.stream.flush(zstandard.FLUSH_FRAME)
+        self.handle.flush()
+
+    def close(self):
+        """
+        Finish the output - handle is left open.
+        """
+        self.finish_member()
+        self.stream = None
@@ -0,0 +1,117 @@
+import json
+import logging
+from django.core.cache import cache
+try:
+    from django.core.exceptions import EmptyResultSet
+except ImportError: # Django < 1.11 compatibility
+    from django.db.models.sql.datastructures import EmptyResultSet
+from django.db import connections
+from django_datatables import caching
+
+logger = logging.getLogger(__name__)
+
+class CountStrategy(object):
+    """
+    Decides how DatatableView counts iTotalRecords/iTotalDisplayRecords.
+    
+    Set per report with Meta.count (or DatatableView.count_strategy), ie..
+    
+        class Meta:
+            count = CappedCount(10000)
+    """
+    def count(self, view, qs, filtered):
+        """
+        Count the records in qs.
+        
+        @param view: The DatatableView doing the counting.
+        @param qs: The queryset to count.
+        @param filtered: Whether qs has been filtered by the request.
+        @return tuple: (count, exact) - exact is False if count is approximate.
+        """
+        raise NotImplementedError
+
+class ExactCount(CountStrategy):
+    """
+    COUNT(*) the queryset every time - the default.
+    """
+    def count(self, view, qs, filtered):
+        return qs.count(), True
+
+class CachedCount(CountStrategy):
+    """
+    Cache the result of another strategy (exact by default) per filter
+    signature. The cache is invalidated by Report.delete_cache().
+    """
+    def __init__(self, seconds=300, strategy=None):
+        self.seconds = seconds
+        self.strategy = strategy or ExactCount()
+
+    def count(self, view, qs, filtered):
+        try:
+            sql = caching.query_signature(qs)
+        except EmptyResultSet:
+            return 0, True
+        signature = view.get_filter_signature() if filtered else ()
+        key = caching.make_key('%s-count' % view.report.cache_namespace(),
+                               view.report.cache_version(), signature, sql)
+        result = cache.get(key)
+        if result is None:
+            result = self.strategy.count(view, qs, filtered)
+            cache.set(key, result, self.seconds)
+        return result
+
+class EstimatedCount(CountStrategy):
+    """
+    Use PostgreSQL's statistics rather than counting - pg_class.reltuples for
+    a whole table and the planner's row estimate (EXPLAIN) otherwise.
+    
+    Estimates below threshold aren't worth the inaccuracy so are counted
+    exactly, as is everything on other databases.
+    """
+    def __init__(self, threshold=10000):
+        self.threshold = threshold
+
+    def count(self, view, qs, filtered):
+        connection = connections[qs.db]
+        if connection.vendor != 'postgresql':
+            return qs.count(), True
+        try:
+            estimate = self.estimate(qs, connection)
+        except EmptyResultSet:
+            return 0, True
+        if estimate is None or estimate < self.threshold:
+            return qs.count(), True
+        return estimate, False
+
+    def estimate(self, qs, connection):
+        query = qs.query
+        with connection.cursor() as cursor:
+            if not query.where.children and not query.distinct:
+                cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [qs.model._meta.db_table])
+                row = cursor.fetchone()
+                if row and row[0] >= 0:
+                    return int(row[0])
+            sql, params = query.sql_with_params()
+            cursor.execute('EXPLAIN (FORMAT JSON) %s' % sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, basestring):
+            plan = json.loads(plan)
+        try:
+            return int(plan[0]['Plan']['Plan Rows'])
+        except (IndexError, KeyError, TypeError, ValueError):
+            logger.debug("Unable to read a row estimate from plan: %s" % plan)
+            return None
+
+class CappedCount(CountStrategy):
+    """
+    Count at most cap records - larger querysets are reported as having cap
+    records and flagged as approximate (ie.. "more than 10,000").
+    """
+    def __init__(self, cap=10000):
+        self.cap = cap
+
+    def count(self, view, qs, filtered):
+        count = qs[:self.cap + 1].count()
+        if count > self.cap:
+            return self.cap, False
+        return count, True
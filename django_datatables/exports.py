@@ -0,0 +1,234 @@
+import os
+import csv
+import json
+import shutil
+import logging
+from multiprocessing.pool import Pool
+from django_datatables.compression import CompressedWriter
+from django_datatables.snapshots import close_connections
+from django_datatables.utils import is_model_queryset, get_keyset_ordering, \
+    lookup_value, seek_q, json_safe
+from django_datatables.writers.csv_writers import UnicodeCsvWriter
+from django_toolkit.csv.unicode import UnicodeWriter
+try:
+    # Django versions >= 1.9
+    from django.utils.module_loading import import_module
+except ImportError:
+    # Django versions < 1.9
+    from django.utils.importlib import import_module
+
+logger = logging.getLogger(__name__)
+
+# The number of rows written between checkpoints of a resumable export.
+CHECKPOINT_ROWS = 50000
+
+def partial_path(path):
+    """
+    Return the path an export to path is written to until it is complete.
+    """
+    return '%s.partial' % path
+
+def checkpoint_path(path):
+    return '%s.checkpoint' % path
+
+def load_checkpoint(path):
+    """
+    Return the last checkpoint of the export to path, or None if there isn't
+    one to resume from.
+    """
+    if not os.path.exists(partial_path(path)):
+        return None
+    try:
+        with open(checkpoint_path(path), 'rb') as handle:
+            return json.load(handle)
+    except (IOError, ValueError):
+        return None
+
+def save_checkpoint(path, checkpoint):
+    tmp = '%s.tmp' % checkpoint_path(path)
+    with open(tmp, 'wb') as handle:
+        json.dump(checkpoint, handle)
+    os.rename(tmp, checkpoint_path(path))
+
+def find_resumable(directory, prefix, suffix):
+    """
+    Return the path of the most recent interrupted export in directory whose
+    file name starts with prefix and ends with suffix, or None.
+    """
+    if not os.path.isdir(directory):
+        return None
+    names = sorted(name[:-len('.checkpoint')] for name in os.listdir(directory)
+                   if name.startswith(prefix) and name.endswith('%s.checkpoint' % suffix))
+    return os.path.join(directory, names[-1]) if names else None
+
+def write_csv(report, path, compression=None, resume=False, checkpoint_rows=CHECKPOINT_ROWS):
+    """
+    Write report to a csv at path - to a partial file that is renamed to path
+    once complete, so path is never a half written export.
+
+    If the report's queryset can be walked by its ordering (see
+    get_keyset_ordering) the position of the last row written is
+    checkpointed every checkpoint_rows rows and, with resume, an interrupted
+    export carries on from its last checkpoint rather than starting over.
+    Other reports are checkpointed only after the header, so an interrupted
+    export can still be found and is written again from the start.
+
+    @param compression: None, 'gzip' or 'zstd'.
+    @return int: The number of rows written.
+    """
+    partial = partial_path(path)
+    checkpoint = load_checkpoint(path) if resume else None
+    qs = report.queryset()
+    ordering = get_keyset_ordering(qs) if is_model_queryset(qs) else None
+    if ordering is not None:
+        qs = qs.order_by(*ordering)
+        if checkpoint is not None and checkpoint['values'] is not None:
+            qs = qs.filter(seek_q(ordering, checkpoint['values']))
+    else:
+        # Without a checkpoint to seek from the export starts over.
+        checkpoint = None
+    handle = open(partial, 'r+b' if checkpoint is not None else 'wb')
+    try:
+        rows = 0
+        if checkpoint is not None:
+            logger.info("Resuming export of '%s' after %s rows" % (path, checkpoint['rows']))
+            rows = checkpoint['rows']
+            handle.truncate(checkpoint['offset'])
+            handle.seek(checkpoint['offset'])
+        output = CompressedWriter(handle, compression)
+        writer = UnicodeWriter(output, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        if checkpoint is None:
+            writer.writerow(report.titles())
+            # Checkpoint straight away so find_resumable() finds an export
+            # interrupted before its first full checkpoint.
+            output.finish_member()
+            save_checkpoint(path, {'values': None, 'offset': handle.tell(), 'rows': 0})
+        for item, cells in UnicodeCsvWriter(report, qs).iter_cells(ignore_missing_pre_process=True):
+            writer.writerow([u"%s" % value for column, value in cells])
+            rows += 1
+            if ordering is not None and rows % checkpoint_rows == 0:
+                values = [json_safe(lookup_value(item, lookup.lstrip('-'))) for lookup in ordering]
+                if None in values:
+                    # ie.. the ordering isn't in a Meta.projection = 'values'
+                    # row - there's nothing to seek from.
+                    continue
+                output.finish_member()
+                os.fsync(handle.fileno())
+                save_checkpoint(path, {'values': values, 'offset': handle.tell(), 'rows': rows})
+        output.close()
+    finally:
+        handle.close()
+    os.rename(partial, path)
+    if os.path.exists(checkpoint_path(path)):
+        os.unlink(checkpoint_path(path))
+    return rows
+
+def get_partitions(qs, key, count):
+    """
+    Split qs into at most count ranges of key with roughly the same number of
+    rows each.
+
+    @return list: A list of (lower, upper) tuples in the order the rows are
+                  output - a range holds the rows where lower <= key < upper,
+                  None being unbounded.
+    """
+    lookup = key.lstrip('-')
+    total = qs.count()
+    if count <= 1 or total <= count:
+        return [(None, None)]
+    values = qs.order_by(lookup).values_list(lookup, flat=True)
+    step = total // count
+    boundaries = []
+    for index in range(1, count):
+        value = values[index * step]
+        # Equal keys must stay in one range.
+        if not boundaries or value != boundaries[-1]:
+            boundaries.append(value)
+    partitions = zip([None] + boundaries, boundaries + [None])
+    if key.startswith('-'):
+        partitions.reverse()
+    return partitions
+
+def _export_partition(task):
+    """
+    Pool worker for export_csv - writes the rows of one partition without a
+    header and returns (path, error) so the result can cross a process
+    boundary.
+    """
+    module, ordering, lower, upper, path = task
+    try:
+        report = import_module(module).Report()
+        lookup = ordering[0].lstrip('-')
+        qs = report.queryset()
+        if lower is not None:
+            qs = qs.filter(**{'%s__gte' % lookup: lower})
+        if upper is not None:
+            qs = qs.filter(**{'%s__lt' % lookup: upper})
+        UnicodeCsvWriter(report, qs.order_by(*ordering)).write(path, header=False)
+        return path, None
+    except Exception as e:
+        logger.exception("Unable to export rows %s to %s of report '%s'" % (lower, upper, module))
+        return path, '%s' % e
+    finally:
+        close_connections()
+
+def export_csv(module, path, processes=1, partitions=None, compression=None, resume=False):
+    """
+    Write the report in module to a csv at path. With more than one process
+    the report's queryset is split into ranges of the first lookup of its
+    ordering (see get_keyset_ordering), each range is written by a worker process with its
+    own database connection and the parts are joined in order under a single
+    header. Otherwise the csv is written by write_csv.
+
+    @param module: The module of the report, ie.. myapp.reports.sales
+    @param path: The path of the csv to write.
+    @param processes: The number of worker processes.
+    @param partitions: The number of ranges, defaults to processes.
+    @param compression: None, 'gzip' or 'zstd'.
+    @param resume: Whether to resume an interrupted export to path - only
+                   single process exports are resumable.
+    """
+    report = import_module(module).Report()
+    qs = report.queryset()
+    # Partitions are written in the same order as write_csv() writes rows -
+    # which needs an ordering that can be split into ranges of its first
+    # lookup.
+    ordering = get_keyset_ordering(qs) if is_model_queryset(qs) else None
+    if processes > 1 and ordering is None:
+        logger.warning("The ordering of '%s' can't be partitioned - writing it in one process" % module)
+    if processes <= 1 or ordering is None:
+        write_csv(report, path, compression, resume)
+        return
+    if resume:
+        logger.warning("Parallel exports aren't resumable - '%s' is written again from the start" % path)
+    tasks = []
+    for index, (lower, upper) in enumerate(get_partitions(qs, ordering[0], partitions or processes)):
+        tasks.append((module, ordering, lower, upper, '%s.part%s' % (path, index)))
+    try:
+        # Forked workers must not share the parent's connections.
+        close_connections()
+        pool = Pool(processes)
+        try:
+            results = pool.map(_export_partition, tasks)
+        finally:
+            pool.close()
+            pool.join()
+        errors = [error for part, error in results if error]
+        if errors:
+            raise RuntimeError("Unable to export report '%s': %s" % (module, '; '.join(errors)))
+        with open(partial_path(path), 'wb') as handle:
+            output = CompressedWriter(handle, compression)
+            UnicodeWriter(output, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL).writerow(report.titles())
+            for part, error in results:
+                with open(part, 'rb') as part_handle:
+                    shutil.copyfileobj(part_handle, output)
+            output.close()
+        os.rename(partial_path(path), path)
+        if os.path.exists(checkpoint_path(path)):
+            # Left by an interrupted single process export to path.
+            os.unlink(checkpoint_path(path))
+    finally:
+        for task in tasks:
+            part = task[-1]
+            if os.path.exists(part):
+                os.unlink(part)
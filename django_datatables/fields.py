@@ -24,6 +24,7 @@ get_title = lambda title: title.replace('_', ' ').title().strip()
 
 BLANK_CHOICE_DASH = [("", "---------")]
 CHOICE_NULL = '**NULL**'
+LOOKUP_EXACT_THEN_PREFIX = 'exact_then_prefix'
 
 @total_ordering
 class Field(object):
@@ -43,7 +44,7 @@ class Field(object):
                  error_messages=None, position=False, hidden=False,
                  form_field_name=False, 
                  pre_process_with=False, post_process_with=False,
-                 add_null_choice=False):
+                 add_null_choice=False, lookup_type=None, numeric_with=False):
         """
         @param name:           The name for the field
         @param title:          Title used for displaying the field
@@ -62,12 +63,21 @@ class Field(object):
         @param widget:         The widget to use for rendering.
         @param localize:       Whether this field should be localized or not.
         @param aggregate:      Whether aggregates for this field should be produced.
+                               True sums the field, otherwise one of 'sum', 'avg',
+                               'min', 'max', 'count', 'distinct_count' or a django
+                               aggregate (ie.. Avg('amount')).
         @param error_messages: A list of default error messages.
         @param position:       The fields position. Fields are displayed in the 
                                order they are created however if you have a report
                                that extends another report you can control the 
                                position of each field using this value.
         @param hidden:         Whether this field should be hidden in datatables.
+        @param lookup_type:    The lookup used to filter by this field - ie.. istartswith
+                               or iexact, which (unlike the default icontains) can use an
+                               index. 'exact_then_prefix' filters by exact match and falls
+                               back to istartswith when nothing matches exactly.
+        @param numeric_with:   A lookup (ie.. pk) that is used alone, as an exact match,
+                               when the term is an integer.
         """
         self.name = name
         self.title = title
@@ -89,6 +99,9 @@ class Field(object):
         self.form_field_name = form_field_name
         self.pre_process_with = pre_process_with
         self.post_process_with = post_process_with
+        if lookup_type:
+            self.lookup_type = lookup_type
+        self.numeric_with = numeric_with
         
         widget = widget or self.widget
         if isinstance(widget, type):
@@ -256,13 +269,80 @@ class Field(object):
                 lookup_model = lookup_field
 
         return lookup_field
+
+    def get_related_lookups(self):
+        """
+        Return a tuple of (select_related, prefetch_related) lookups that are
+        needed to render this field without a query per row. These are only
+        candidates - they are checked against the queryset's model before use.
+        """
+        parts = self.name.split(LOOKUP_SEP)
+        if len(parts) > 1:
+            return ((LOOKUP_SEP.join(parts[:-1]), ), ())
+        return ((), ())
+
+    def get_projection_lookups(self):
+        """
+        Return the lookups that must be fetched to render this field when the
+        report's queryset is projected with only()/values().
+        """
+        return (self.name, )
     
+    def get_numeric_term(self, term):
+        """
+        Return term as an int if the field has a numeric fast path and term is
+        an integer, otherwise None.
+        """
+        if not self.numeric_with or not isinstance(term, basestring):
+            return None
+        try:
+            return int(term.strip())
+        except ValueError:
+            return None
+
+    def get_lookup_type(self, exact=False):
+        if exact and self.choices:
+            return 'exact'
+        if self.lookup_type == LOOKUP_EXACT_THEN_PREFIX:
+            # Without a queryset to try the exact match on, prefix matching
+            # covers both.
+            return 'istartswith'
+        return self.lookup_type
+
+    def filter_queryset(self, qs, term, exact=False):
+        """
+        Filter qs by term - as per get_qs_for_term() but with the lookups that
+        need to query, ie.. exact_then_prefix.
+        """
+        from django_datatables import ValidationError
+        if self.lookup_type == LOOKUP_EXACT_THEN_PREFIX and self.get_lookup_type(exact) == 'istartswith' \
+                and self.get_numeric_term(term) is None:
+            qs_params = None
+            for filter_with in self.filter_with:
+                try:
+                    q = Q(**{'%s__exact' % filter_with: self.to_python(term)})
+                except ValidationError:
+                    continue
+                qs_params = qs_params | q if qs_params else q
+            if qs_params:
+                exact_qs = qs.filter(qs_params)
+                if exact_qs.exists():
+                    return exact_qs
+        qs_params = self.get_qs_for_term(term, exact)
+        if qs_params:
+            qs = qs.filter(qs_params)
+        return qs
+
     def get_qs_for_term(self, term, exact=False):
         from django_datatables import ValidationError
+        numeric = self.get_numeric_term(term)
+        if numeric is not None:
+            # An integer - the numeric lookup alone can use its index.
+            return Q(**{self.numeric_with: numeric})
         qs_params = None
         for filter_with in self.filter_with:
             try:
-                lookup_type = 'exact' if exact and self.choices else self.lookup_type
+                lookup_type = self.get_lookup_type(exact)
                 if ',' in term and self.choices:
                     lookup_type = 'in'
                     term = term.split(',')
@@ -411,6 +491,12 @@ class DateField(Field):
 
         msg = self.error_messages['invalid'] % value
         raise ValidationError(msg)
+
+    def get_lookup_type(self, exact=False):
+        if self.lookup_type == LOOKUP_EXACT_THEN_PREFIX:
+            # Terms are parsed into dates, which can't be prefix matched.
+            return 'exact'
+        return Field.get_lookup_type(self, exact)
     
     def get_qs_for_term(self, term, exact=False):
         from django_datatables import ValidationError
@@ -442,7 +528,7 @@ class DateField(Field):
                 if finish:
                     kwargs['%s__lte' % filter_with] = self.to_python(finish)
                 if not start and not finish:
-                    kwargs['%s__%s' % (filter_with, self.lookup_type)] = self.to_python(term)
+                    kwargs['%s__%s' % (filter_with, self.get_lookup_type(exact))] = self.to_python(term)
                 
                 q = Q(**kwargs)
                 qs_params = qs_params | q if qs_params else q
@@ -665,6 +751,9 @@ class ForeignKey(UrlField):
         
         Field.__init__(self, *args, **kwargs)
 
+    def get_related_lookups(self):
+        return ((self.name, ), ())
+
 class ManyManyField(UrlField):
     """
     Supports linking to the related object
@@ -684,6 +773,9 @@ class ManyManyField(UrlField):
         
         Field.__init__(self, *args, **kwargs)
 
+    def get_related_lookups(self):
+        return ((), (self.name, ))
+
 class ManyManyLabelField(ManyManyField):
     widget = ManyManyLabelWidget
     
@@ -705,6 +797,10 @@ class SelfField(ForeignKey):
 
 class AnnotatedForeignKey(ForeignKey):
     widget = AnnotatedForeignKeyWidget
+
+    def get_related_lookups(self):
+        # The value is an annotated pk, not a relation.
+        return ((), ())
     
 class CommaSeparatedField(Field):
     """
@@ -730,6 +826,9 @@ class CommaSeparatedForeignKey(ForeignKey):
     """
     widget = CommaSeparatedForeignKeyWidget
 
+    def get_related_lookups(self):
+        return ((), (self.name, ))
+
 class ActionsField(Field):
     widget = ActionsWidget
 
@@ -784,6 +883,12 @@ class DynamicField(CharField):
     def traverse_for_value(self, data, name=None):
         return None
 
+    def get_related_lookups(self):
+        return ((), ())
+
+    def get_projection_lookups(self):
+        return ()
+
     def get_qs_for_term(self, term, exact=False):
         """
         No filtering available if it's not an actual field in a table.
@@ -1,9 +1,12 @@
 import sys, logging, importlib, os
+from optparse import make_option
 from django.conf import settings
 from django.core.management.base import BaseCommand
 from datetime import datetime
 from django_datatables.writers.csv_writers import UnicodeCsvWriter
 from django_datatables.writers.console import ConsoleWriter
+from django_datatables.exports import export_csv, find_resumable
+from django_datatables.compression import SUFFIXES
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +14,16 @@ class Command(BaseCommand):
     args = 'my.datatables.module writer'
     help = "Write out a report. Currently supported writers are 'csv'."
     now = datetime.now()
+    option_list = BaseCommand.option_list + (
+        make_option('--processes', dest='processes', type='int', default=1,
+                    help='The number of worker processes to write a csv with.'),
+        make_option('--partitions', dest='partitions', type='int', default=None,
+                    help='The number of ranges to split a csv into, defaults to --processes.'),
+        make_option('--compress', dest='compress', type='choice', choices=sorted(SUFFIXES), default=None,
+                    help='Compress the csv with gzip or zstd.'),
+        make_option('--resume', dest='resume', action='store_true', default=False,
+                    help='Resume the most recent interrupted export of the report.'),
+    )
 
     def handle(self, *args, **options):
         """
@@ -35,11 +48,19 @@ class Command(BaseCommand):
             sys.exit('Writer %s not supported by report.' % writer) 
         
         if writer_cls == UnicodeCsvWriter:
-            writer = UnicodeCsvWriter(report)
-            path = os.path.join(settings.MEDIA_ROOT, settings.REPORT_ROOT, module, "%s-%s.csv" % (report._meta.slug, self.now.strftime('%Y%m%d%H%M%S')))
-            if not os.path.isdir(os.path.dirname(path)):
-                os.makedirs(os.path.dirname(path), settings.FILE_UPLOAD_PERMISSIONS)
-            writer.write(path)
+            directory = os.path.join(settings.MEDIA_ROOT, settings.REPORT_ROOT, module)
+            suffix = '.csv%s' % SUFFIXES.get(options['compress'], '')
+            path = None
+            if options['resume'] and options['processes'] > 1:
+                sys.exit("--resume can't be used with --processes, parallel exports aren't resumable.")
+            if options['resume']:
+                path = find_resumable(directory, '%s-' % report._meta.slug, suffix)
+            if path is None:
+                path = os.path.join(directory, "%s-%s%s" % (report._meta.slug, self.now.strftime('%Y%m%d%H%M%S'), suffix))
+            if not os.path.isdir(directory):
+                os.makedirs(directory, settings.FILE_UPLOAD_PERMISSIONS)
+            export_csv(module, path, options['processes'], options['partitions'],
+                       options['compress'], options['resume'])
             print "Created: %s" % path
         
         elif writer_cls == ConsoleWriter:
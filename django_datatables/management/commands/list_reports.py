@@ -2,7 +2,7 @@ import sys, logging, importlib, os
 from django.conf import settings
 from django.core.management.base import BaseCommand
 from datetime import datetime
-from django_datatables import get_reports, load_report_class
+from django_datatables import registry
 from django_toolkit.table.console import ConsoleTable
 
 logger = logging.getLogger(__name__)
@@ -16,16 +16,16 @@ class Command(BaseCommand):
         """
         Run/write out a particular report.
         """
-        reports = get_reports()
-        
+        # Read the metadata off each report class - the classes are imported
+        # once and never instantiated.
         rows = [
             (
-                load_report_class(app_name, name)._meta.verbose_name,
-                load_report_class(app_name, name)._meta.description,
-                "%s.reports.%s" % (app_name, name), 
-                ", ".join([writer.__name__ for writer in load_report_class(app_name, name).writers()]),
+                report_class._meta.verbose_name,
+                report_class._meta.description,
+                "%s.reports.%s" % (app_name, name),
+                ", ".join([writer.__name__ for writer in report_class._meta.writers]),
             )
-            for key, (name, app_name) in reports.iteritems()
+            for key, name, app_name, report_class in registry.classes()
         ]
         
         print ConsoleTable(('Name', 'Description', 'Module', 'Writers',), rows)
@@ -0,0 +1,43 @@
+import sys, logging
+from optparse import make_option
+from django.core.management.base import BaseCommand
+from django_datatables import registry
+from django_datatables.snapshots import materialize_reports
+from django_datatables.models import ReportSnapshot
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    args = '[my.datatables.module ...]'
+    help = "Materialize reports into snapshots for DatatableView to serve from. Defaults to every report with Meta.materialize set."
+    option_list = BaseCommand.option_list + (
+        make_option('--concurrency', dest='concurrency', type='int', default=1,
+                    help='The number of threads to materialize reports with.'),
+        make_option('--processes', dest='processes', type='int', default=1,
+                    help='The number of worker processes to materialize reports with - for CPU bound reports.'),
+    )
+
+    def handle(self, *args, **options):
+        """
+        Materialize the given reports, or all reports with Meta.materialize set.
+        """
+        modules = list(args)
+        if not modules:
+            for key, name, app_name, report_class in registry.classes():
+                if report_class._meta.materialize:
+                    modules.append('%s.reports.%s' % (app_name, name))
+        if not modules:
+            sys.exit("No reports to materialize.")
+        if options['concurrency'] > 1 and options['processes'] > 1:
+            sys.exit("Use either --concurrency or --processes, not both.")
+
+        failed = False
+        for module, pk, error in materialize_reports(modules, options['concurrency'], options['processes']):
+            if error:
+                failed = True
+                print "Failed: %s (%s)" % (module, error)
+            else:
+                snapshot = ReportSnapshot.objects.get(pk=pk)
+                print "Materialized: %s (%s rows in %.2fs)" % (module, snapshot.rows, snapshot.duration)
+        if failed:
+            sys.exit(1)
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datatables', '0002_auto_20160526_1047'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportSnapshot',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('report', models.CharField(max_length=191, db_index=True)),
+                ('path', models.CharField(max_length=255)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('duration', models.FloatField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'get_latest_by': 'created',
+            },
+        ),
+    ]
@@ -29,3 +29,23 @@ class DatatableState(models.Model):
             return self.filter(user=user)
         def report(self, report):
             return self.filter(report=report)
+
+class ReportSnapshot(models.Model):
+    """A materialized copy of a report's data - see the materialize_reports command."""
+    report = models.CharField(max_length=191, db_index=True)
+    path = models.CharField(max_length=255)
+    rows = models.PositiveIntegerField(default=0)
+    duration = models.FloatField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    objects = QuerySetManager()
+
+    class Meta:
+        get_latest_by = 'created'
+
+    def __unicode__(self):
+        return '%s (%s)' % (self.report, self.created)
+
+    class QuerySet(QuerySet):
+        def report(self, report):
+            return self.filter(report=report)
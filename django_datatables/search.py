@@ -0,0 +1,133 @@
+import logging
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django_datatables.utils import is_model_queryset
+
+logger = logging.getLogger(__name__)
+
+class SearchBackend(object):
+    """
+    Decides how the global search box (sSearch) filters a report.
+
+    Set per report with Meta.search, ie..
+
+        class Meta:
+            search = PostgresSearch(config='english')
+
+    Backends search the lookups in Options.search_lookups - the filter_with
+    lookups of the report's filter=True fields.
+    """
+    def search(self, report, qs, term):
+        """
+        Filter qs down to the rows matching term.
+
+        @param report: The report being searched.
+        @param qs: The queryset to filter.
+        @param term: The search term - never empty.
+        @return: The filtered queryset.
+        """
+        raise NotImplementedError
+
+class ContainsSearch(SearchBackend):
+    """
+    OR each field's own lookup (icontains by default) together - the default.
+    Works everywhere, including reports that aren't backed by a queryset, but
+    can't use an index.
+    """
+    def search(self, report, qs, term):
+        qs_params = report.get_qs_for_term(term)
+        if qs_params:
+            qs = qs.filter(qs_params)
+        return qs
+
+class PostgresSearch(SearchBackend):
+    """
+    PostgreSQL full text search (django.contrib.postgres, Django >= 1.10).
+
+    With vector_field set the search runs against a stored SearchVectorField
+    (keep it up to date with a trigger and index it with GIN), otherwise the
+    vector is built from the search lookups on the fly - which can use a GIN
+    expression index on the same to_tsvector() expression.
+    """
+    def __init__(self, config=None, vector_field=None):
+        self.config = config
+        self.vector_field = vector_field
+
+    def search(self, report, qs, term):
+        try:
+            from django.contrib.postgres.search import SearchQuery, SearchVector
+        except ImportError:
+            raise ImproperlyConfigured("PostgresSearch requires django.contrib.postgres (Django >= 1.10).")
+        query = SearchQuery(term, config=self.config) if self.config else SearchQuery(term)
+        if self.vector_field:
+            return qs.filter(**{self.vector_field: query})
+        lookups = report._meta.search_lookups
+        vector = SearchVector(*lookups, config=self.config) if self.config else SearchVector(*lookups)
+        return qs.annotate(_search_vector=vector).filter(_search_vector=query)
+
+class TrigramSearch(SearchBackend):
+    """
+    PostgreSQL pg_trgm similarity (Django >= 1.10) - matches rows where any of
+    the search lookups is similar to term. Index the columns with a GIN
+    gin_trgm_ops index.
+    """
+    def search(self, report, qs, term):
+        qs_params = None
+        for lookup in report._meta.search_lookups:
+            q = Q(**{'%s__trigram_similar' % lookup: term})
+            qs_params = qs_params | q if qs_params else q
+        if qs_params:
+            qs = qs.filter(qs_params)
+        return qs
+
+class SqliteFTS5Search(SearchBackend):
+    """
+    SQLite FTS5 - searches an FTS5 table (table, defaulting to the model's
+    table with an _fts suffix) whose rowid is the primary key of the report's
+    model and whose columns are the search lookups. Create and fill the table
+    with build().
+
+    Each word of the term is matched as a prefix.
+    """
+    def __init__(self, table=None, using='default'):
+        self.table = table
+        self.using = using
+
+    def get_table(self, model):
+        return self.table or '%s_fts' % model._meta.db_table
+
+    def get_query(self, term):
+        """
+        Return term as an FTS5 query - each word quoted (so the FTS5 syntax
+        can't be injected) and matched as a prefix.
+        """
+        return ' '.join('"%s"*' % word.replace('"', '""') for word in term.split())
+
+    def search(self, report, qs, term):
+        if not is_model_queryset(qs):
+            raise ImproperlyConfigured("SqliteFTS5Search requires a report with a model queryset.")
+        query = self.get_query(term)
+        if not query:
+            return qs
+        table = self.get_table(qs.model)
+        return qs.filter(pk__in=RawSQL('SELECT rowid FROM "%s" WHERE "%s" MATCH %%s' % (table, table), [query]))
+
+    def build(self, report):
+        """
+        (Re)create the FTS5 table of report and fill it from the report's
+        queryset.
+        """
+        qs = report.queryset()
+        table = self.get_table(qs.model)
+        lookups = report._meta.search_lookups
+        columns = ', '.join('"%s"' % lookup for lookup in lookups)
+        connection = connections[self.using]
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS "%s"' % table)
+            cursor.execute('CREATE VIRTUAL TABLE "%s" USING fts5(%s)' % (table, columns))
+            sql = 'INSERT INTO "%s" (rowid, %s) VALUES (%s)' % (table, columns, ', '.join(['%s'] * (len(lookups) + 1)))
+            cursor.executemany(sql, ([row[0]] + [u'' if value is None else u'%s' % value for value in row[1:]]
+                                     for row in qs.values_list('pk', *lookups).iterator()))
+        logger.info("Built search table '%s' for report '%s'" % (table, report.__class__.__name__))
@@ -0,0 +1,64 @@
+import json
+import datetime
+from decimal import Decimal
+from django.conf import settings
+from django.utils.encoding import force_text
+from django.utils.functional import Promise
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+def default(value):
+    """
+    Convert the types json encoders don't know about - lazy strings,
+    decimals, dates and times - the same way for every encoder.
+    """
+    if isinstance(value, Promise):
+        return force_text(value)
+    if isinstance(value, Decimal):
+        return '%s' % value
+    if isinstance(value, datetime.datetime):
+        iso = value.isoformat()
+        if value.microsecond:
+            iso = iso[:23] + iso[26:]
+        if iso.endswith('+00:00'):
+            iso = iso[:-6] + 'Z'
+        return iso
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return force_text(value)
+
+def coerce(value):
+    """
+    Return value with everything converted to types any encoder can handle -
+    for encoders without a default hook (ujson). Dict keys become strings.
+    """
+    if isinstance(value, dict):
+        return dict(('%s' % key, coerce(item)) for key, item in value.iteritems())
+    if isinstance(value, (list, tuple)):
+        return [coerce(item) for item in value]
+    if value is None or isinstance(value, (basestring, bool, int, long, float)):
+        return value
+    return default(value)
+
+def get_backend():
+    """
+    Return the name of the encoder to use - settings.DATATABLES_JSON_SERIALIZER
+    ('ujson' or 'json') or the fastest one installed.
+    """
+    backend = getattr(settings, 'DATATABLES_JSON_SERIALIZER', None)
+    if backend:
+        return backend
+    if ujson is not None:
+        return 'ujson'
+    return 'json'
+
+def dumps(data, backend=None):
+    """
+    Serialize data to JSON with the fastest available encoder.
+    """
+    backend = backend or get_backend()
+    if backend == 'ujson':
+        return ujson.dumps(coerce(data), ensure_ascii=False)
+    return json.dumps(data, default=default)
@@ -0,0 +1,485 @@
+import os
+import time
+import gzip
+import json
+import logging
+import tempfile
+import datetime
+from decimal import Decimal
+from collections import OrderedDict
+from multiprocessing.pool import Pool, ThreadPool
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models.base import Model
+from django.utils.dateparse import parse_date, parse_datetime, parse_time
+from django.utils.encoding import force_text
+from moneyed import Money
+from django_datatables.utils import iter_queryset, lookup_value
+try:
+    # Django versions >= 1.9
+    from django.utils.module_loading import import_module
+except ImportError:
+    # Django versions < 1.9
+    from django.utils.importlib import import_module
+
+logger = logging.getLogger(__name__)
+
+# The number of snapshots of each report to keep - older ones are pruned
+# once a new one has been made. More than one so a process that has just
+# looked up the previous snapshot can still load it.
+SNAPSHOTS_KEEP = 2
+# The number of snapshots each process keeps loaded, and the most rows a
+# snapshot can have to be kept loaded.
+SNAPSHOTS_CACHE = 4
+SNAPSHOTS_CACHE_ROWS = 100000
+# The number of filtered/ordered row lists each Snapshot remembers.
+SNAPSHOT_MEMO = 8
+
+# The most recently loaded snapshots in this process, least recently used
+# first, keyed by report - a tuple of (ReportSnapshot pk, Snapshot).
+_snapshots = OrderedDict()
+
+def report_label(report):
+    """
+    Return the label ReportSnapshot rows are stored under for report.
+    """
+    return '%s.%s' % (report.__module__, report.__class__.__name__)
+
+def get_snapshot_root():
+    """
+    Return the directory snapshots are written to -
+    settings.DATATABLES_SNAPSHOT_ROOT or a directory in the system's temp
+    directory. Snapshots hold every row of a report so the directory must not
+    be served, ie.. inside MEDIA_ROOT or STATIC_ROOT.
+    """
+    root = getattr(settings, 'DATATABLES_SNAPSHOT_ROOT', None) or \
+        os.path.join(tempfile.gettempdir(), 'django_datatables', 'snapshots')
+    root = os.path.abspath(root)
+    for served in (getattr(settings, 'MEDIA_ROOT', None), getattr(settings, 'STATIC_ROOT', None)):
+        if served and (root + os.sep).startswith(os.path.abspath(served) + os.sep):
+            raise ImproperlyConfigured("DATATABLES_SNAPSHOT_ROOT must not be inside '%s'" % served)
+    return root
+
+def snapshot_path(report, now=None):
+    now = now or datetime.datetime.now()
+    return os.path.join(get_snapshot_root(), report.__module__,
+                        "%s-%s.json.gz" % (report._meta.slug, now.strftime('%Y%m%d%H%M%S%f')))
+
+def close_connections():
+    """
+    Close the database connections of the current thread - so threads don't
+    leak them and forked processes don't share them.
+    """
+    for connection in connections.all():
+        connection.close()
+
+class ModelReference(object):
+    """
+    A model instance in a snapshot being loaded - see Snapshot.load().
+    """
+    def __init__(self, label, pk):
+        self.label = label
+        self.pk = pk
+
+def encode_value(value):
+    """
+    Return value as something json can hold - types json doesn't know are
+    tagged so decode_value() gets them back. Model instances are stored as
+    references and unknown types as text.
+    """
+    if value is None or isinstance(value, (basestring, bool, int, long, float)):
+        return value
+    if isinstance(value, list):
+        return [encode_value(item) for item in value]
+    if isinstance(value, tuple):
+        return {'__tuple__': [encode_value(item) for item in value]}
+    if isinstance(value, dict):
+        return {'__dict__': [[encode_value(key), encode_value(item)] for key, item in value.iteritems()]}
+    if isinstance(value, Decimal):
+        return {'__decimal__': '%s' % value}
+    if isinstance(value, datetime.datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {'__time__': value.isoformat()}
+    if isinstance(value, datetime.timedelta):
+        return {'__timedelta__': [value.days, value.seconds, value.microseconds]}
+    if isinstance(value, Money):
+        return {'__money__': ['%s' % value.amount, value.currency.code]}
+    if isinstance(value, Model):
+        return {'__model__': value._meta.label_lower if hasattr(value._meta, 'label_lower') else
+                '%s.%s' % (value._meta.app_label, value._meta.model_name), 'pk': encode_value(value.pk)}
+    return force_text(value)
+
+def decode_value(value):
+    """
+    The json object_hook reversing encode_value().
+    """
+    if '__tuple__' in value:
+        return tuple(value['__tuple__'])
+    if '__dict__' in value:
+        return dict((key, item) for key, item in value['__dict__'])
+    if '__decimal__' in value:
+        return Decimal(value['__decimal__'])
+    if '__datetime__' in value:
+        return parse_datetime(value['__datetime__'])
+    if '__date__' in value:
+        return parse_date(value['__date__'])
+    if '__time__' in value:
+        return parse_time(value['__time__'])
+    if '__timedelta__' in value:
+        return datetime.timedelta(*value['__timedelta__'])
+    if '__money__' in value:
+        return Money(*value['__money__'])
+    if '__model__' in value:
+        return ModelReference(value['__model__'], value['pk'])
+    return value
+
+def _resolve(value, instances):
+    if isinstance(value, ModelReference):
+        return instances.get(value.label, {}).get(value.pk)
+    if isinstance(value, list):
+        return [_resolve(item, instances) for item in value]
+    if isinstance(value, tuple):
+        return tuple(_resolve(item, instances) for item in value)
+    return value
+
+def _collect(value, references):
+    if isinstance(value, ModelReference):
+        references.setdefault(value.label, set()).add(value.pk)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _collect(item, references)
+
+def resolve_references(rows):
+    """
+    Replace the ModelReferences in rows (in place) with their instances,
+    fetching them with a query per model. Deleted instances become None.
+    """
+    from django.apps import apps
+    references = {}
+    for row in rows:
+        for value in row.itervalues():
+            _collect(value, references)
+    instances = {}
+    for label, pks in references.iteritems():
+        instances[label] = apps.get_model(label)._default_manager.in_bulk(list(pks))
+    if instances:
+        for row in rows:
+            for key, value in row.items():
+                row[key] = _resolve(value, instances)
+
+def get_lookups(field):
+    """
+    Return the lookups a snapshot row holds for field besides its value -
+    the ones it's filtered and sorted with.
+    """
+    sorting_with = field.sorting_with if isinstance(field.sorting_with, (list, tuple)) else (field.sorting_with, )
+    lookups = tuple(field.filter_with or ()) + tuple(lookup for lookup in sorting_with if lookup)
+    if field.numeric_with:
+        lookups += (field.numeric_with, )
+    return tuple(lookup for lookup in lookups if lookup != field.name)
+
+def gather_rows(report):
+    """
+    Return the rows of report for a snapshot - as per Report._gather_data()
+    plus the values of each field's filter_with/sorting_with lookups.
+    """
+    fields = report.fields()
+    lookups = sorted(set(lookup for field in fields for lookup in get_lookups(field)))
+    rows = []
+    for item in iter_queryset(report.prepare_queryset(report.queryset())):
+        row = {}
+        for field in fields:
+            at = field.traverse_for_value(item)
+            row[field.name] = at() if callable(at) else at
+        for lookup in lookups:
+            row[lookup] = lookup_value(item, lookup)
+        rows.append(row)
+    return rows
+
+def compare(value, lookup_type, term):
+    """
+    Does value match term with the django lookup lookup_type? term has been
+    through Field.to_python(). Unsupported lookups are a case insensitive
+    contains.
+    """
+    if value is None:
+        return False
+    if lookup_type == 'in':
+        return force_text(value) in [force_text(item) for item in term]
+    if lookup_type in ('exact', 'gte', 'lte', 'gt', 'lt'):
+        if isinstance(value, Model):
+            value = value.pk
+        try:
+            if lookup_type == 'exact':
+                return value == term or force_text(value) == force_text(term)
+            if lookup_type == 'gte':
+                return value >= term
+            if lookup_type == 'lte':
+                return value <= term
+            if lookup_type == 'gt':
+                return value > term
+            return value < term
+        except TypeError:
+            return False
+    value, term = force_text(value), force_text(term)
+    if lookup_type.startswith('i'):
+        value, term = value.lower(), term.lower()
+        lookup_type = lookup_type[1:]
+    if lookup_type == 'exact':
+        return value == term
+    if lookup_type == 'startswith':
+        return value.startswith(term)
+    if lookup_type == 'endswith':
+        return value.endswith(term)
+    return term in value
+
+class Snapshot(object):
+    """
+    The materialized data of a report - the rows as gathered by gather_rows()
+    and the report's aggregates. Filtering, ordering and paging are done in
+    python against the rows, following each field's filter_with,
+    lookup_type and sorting_with, and recently filtered/ordered rows are
+    remembered.
+
+    Snapshots are stored as gzipped json rather than pickled so loading one
+    can't run code.
+    """
+    def __init__(self, rows, aggregates=None):
+        self.rows = rows
+        self.aggregates = aggregates
+        self._memo = OrderedDict()
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, 'rb') as f:
+            data = json.load(f, object_hook=decode_value)
+        rows = data['rows']
+        aggregates = data['aggregates']
+        resolve_references(rows + ([aggregates] if aggregates else []))
+        return cls(rows, aggregates)
+
+    def save(self, path):
+        """
+        Write the snapshot to path - via a temporary file so readers never
+        see a partially written snapshot.
+        """
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path), 0700)
+        tmp_path = '%s.tmp' % path
+        with gzip.open(tmp_path, 'wb') as f:
+            json.dump({'rows': [dict((key, encode_value(value)) for key, value in row.iteritems()) for row in self.rows],
+                       'aggregates': encode_value(self.aggregates)}, f)
+        os.rename(tmp_path, path)
+
+    def _remember(self, key, compute):
+        if key in self._memo:
+            rows = self._memo.pop(key)
+        else:
+            rows = compute()
+        self._memo[key] = rows
+        while len(self._memo) > SNAPSHOT_MEMO:
+            self._memo.popitem(last=False)
+        return rows
+
+    def matches(self, field, row, term, exact=False, lookup_type=None):
+        """
+        Does row match term for field? As per Field.get_qs_for_term() -
+        term is matched against each of the field's filter_with lookups with
+        its lookup type (or lookup_type), date fields take from~to ranges.
+        """
+        from django_datatables import ValidationError
+        from django_datatables.fields import DateField
+        numeric = field.get_numeric_term(term)
+        if numeric is not None:
+            return row.get(field.numeric_with) == numeric
+        lookup_type = lookup_type or field.get_lookup_type(exact)
+        if isinstance(field, DateField) and '~' in term:
+            if term == '~':
+                # No start or finish - as per DateField.get_qs_for_term().
+                return True
+            start, finish = term.split('~', 1)
+            checks = ([('gte', start)] if start else []) + ([('lte', finish)] if finish else [])
+        elif ',' in term and field.choices:
+            checks = [('in', term.split(','))]
+        else:
+            checks = [(lookup_type, term)]
+        try:
+            checks = [(check_type, field.to_python(check_term) if check_type != 'in' else check_term)
+                      for check_type, check_term in checks]
+        except (ValidationError, DjangoValidationError, ValueError, TypeError):
+            return False
+        for lookup in field.filter_with or (field.name, ):
+            value = row.get(lookup)
+            if all(compare(value, check_type, check_term) for check_type, check_term in checks):
+                return True
+        return False
+
+    def filter(self, report, term=None, column_terms=()):
+        """
+        Return the rows matching term across the report's filter fields and
+        each of the (field, term) pairs in column_terms.
+        """
+        key = ('filter', term or None, tuple((field.name, column_term) for field, column_term in column_terms))
+        if key[1] is None and not key[2]:
+            return self.rows
+        return self._remember(key, lambda: self._filter(report, term, column_terms))
+
+    def _filter(self, report, term, column_terms):
+        from django_datatables.fields import LOOKUP_EXACT_THEN_PREFIX
+        rows = self.rows
+        if term:
+            fields = report._meta.filter_fields
+            rows = [row for row in rows if any(self.matches(field, row, term) for field in fields)]
+        for field, column_term in column_terms:
+            if field.lookup_type == LOOKUP_EXACT_THEN_PREFIX and field.get_lookup_type(True) != 'exact':
+                # Exact matches if there are any, otherwise prefix matches.
+                exact = [row for row in rows if self.matches(field, row, column_term, True, 'exact')]
+                if exact:
+                    rows = exact
+                    continue
+            rows = [row for row in rows if self.matches(field, row, column_term, True)]
+        return rows
+
+    def order(self, report, rows, ordering):
+        """
+        Sort rows by ordering - a list of (field name, descending) tuples.
+        Each field sorts by its sorting_with lookups. None sorts before any
+        value.
+        """
+        if rows is not self.rows:
+            # Filtered rows are remembered by filter() already.
+            return self._order(report, rows, ordering)
+        return self._remember(('order', tuple(ordering)), lambda: self._order(report, rows, ordering))
+
+    def _order(self, report, rows, ordering):
+        rows = list(rows)
+        for name, descending in reversed(ordering):
+            field = report.field(name)
+            sorting_with = field.sorting_with if field is not None else name
+            if not isinstance(sorting_with, (list, tuple)):
+                sorting_with = (sorting_with, )
+            lookups = [lookup.lstrip('-') for lookup in sorting_with if lookup] or [name]
+            rows.sort(key=lambda row: [(row.get(lookup) is not None, row.get(lookup)) for lookup in lookups],
+                      reverse=descending)
+        return rows
+
+def load_snapshot(report):
+    """
+    Return the latest Snapshot of report, or None if it hasn't been
+    materialized. Each process keeps the settings.DATATABLES_SNAPSHOTS_CACHE
+    most recently used snapshots with at most
+    settings.DATATABLES_SNAPSHOTS_CACHE_ROWS rows loaded, and reloads one
+    when a newer one is materialized.
+    """
+    from django_datatables.models import ReportSnapshot
+    label = report_label(report)
+    try:
+        record = ReportSnapshot.objects.report(label).latest()
+    except ReportSnapshot.DoesNotExist:
+        return None
+    cached = _snapshots.pop(label, None)
+    if cached and cached[0] == record.pk:
+        _snapshots[label] = cached
+        return cached[1]
+    try:
+        snapshot = Snapshot.load(record.path)
+    except (IOError, OSError, EOFError, ValueError, LookupError) as e:
+        logger.warning("Unable to load snapshot '%s' of report '%s': %s" % (record.path, label, e))
+        return None
+    if len(snapshot.rows) <= getattr(settings, 'DATATABLES_SNAPSHOTS_CACHE_ROWS', SNAPSHOTS_CACHE_ROWS):
+        _snapshots[label] = (record.pk, snapshot)
+        while len(_snapshots) > getattr(settings, 'DATATABLES_SNAPSHOTS_CACHE', SNAPSHOTS_CACHE):
+            _snapshots.popitem(last=False)
+    return snapshot
+
+def is_request_dependent(report):
+    """
+    Return True if report's data may depend on the request - it overrides
+    Report.set_request() or Report.cache_vary().
+    """
+    from django_datatables.base import Report
+    report_class = report.__class__
+    return any(getattr(report_class, name).__func__ is not getattr(Report, name).__func__
+               for name in ('set_request', 'cache_vary'))
+
+def prune_snapshots(label, keep=None):
+    """
+    Delete all but the keep (settings.DATATABLES_SNAPSHOTS_KEEP, 2 by default)
+    most recent snapshots of the report with label, records and files.
+    """
+    from django_datatables.models import ReportSnapshot
+    if keep is None:
+        keep = getattr(settings, 'DATATABLES_SNAPSHOTS_KEEP', SNAPSHOTS_KEEP)
+    for record in ReportSnapshot.objects.report(label).order_by('-created', '-pk')[max(keep, 1):]:
+        try:
+            os.unlink(record.path)
+        except OSError as e:
+            logger.warning("Unable to delete snapshot '%s': %s" % (record.path, e))
+        record.delete()
+
+def materialize_report(module, keep=None):
+    """
+    Gather the data of the report in module, write it out as a snapshot and
+    record it - then prune older snapshots of the report (see
+    prune_snapshots).
+
+    Snapshots are gathered without a request and served to every user, so
+    reports that depend on the request are refused.
+
+    @param module: The module of the report, ie.. myapp.reports.sales
+    @return ReportSnapshot: The record of the new snapshot.
+    """
+    from django_datatables.models import ReportSnapshot
+    report = import_module(module).Report()
+    if is_request_dependent(report):
+        raise ValueError("Report '%s' depends on the request so can't be materialized" % module)
+    started = time.time()
+    rows = gather_rows(report)
+    path = snapshot_path(report)
+    Snapshot(rows, report.get_aggregates()).save(path)
+    duration = time.time() - started
+    logger.info("Materialized report '%s' - %s rows in %.2fs" % (module, len(rows), duration))
+    record = ReportSnapshot.objects.create(report=report_label(report), path=path,
+                                           rows=len(rows), duration=duration)
+    prune_snapshots(record.report, keep)
+    return record
+
+def _materialize(module):
+    """
+    Pool worker for materialize_reports - returns (module, snapshot pk, error)
+    so the result can cross a process boundary.
+    """
+    try:
+        return module, materialize_report(module).pk, None
+    except Exception as e:
+        logger.exception("Unable to materialize report '%s'" % module)
+        return module, None, '%s' % e
+    finally:
+        close_connections()
+
+def materialize_reports(modules, concurrency=1, processes=1):
+    """
+    Materialize each report in modules with a pool of concurrency threads,
+    or of processes processes when processes is more than 1 - for reports
+    whose rendering is CPU bound.
+
+    @return list: A list of (module, ReportSnapshot pk, error) tuples, in the order of modules.
+    """
+    modules = list(modules)
+    if max(concurrency, processes) <= 1 or len(modules) <= 1:
+        return [_materialize(module) for module in modules]
+    if processes > 1:
+        # Forked workers must not share the parent's connections.
+        close_connections()
+        pool = Pool(processes)
+    else:
+        pool = ThreadPool(concurrency)
+    try:
+        return pool.map(_materialize, modules)
+    finally:
+        pool.close()
+        pool.join()
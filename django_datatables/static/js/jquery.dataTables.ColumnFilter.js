@@ -31,10 +31,31 @@
         var afnSearch_ = new Array();
         var aiCustomSearch_Indexes = new Array();
 
-        var oFunctionTimeout = null;
+        //Pending filter timers, one per input - see _fnDebounce
+        var oFunctionTimeouts = {};
 
         var fnOnFiltered = function () { };
 
+        function _fnDebounce(sKey, fnFilter) {
+            ///<summary>
+            ///Run fnFilter once the input has been idle for iFilteringDelay ms - in
+            ///server-side mode every filter is a request, so don't send one per keystroke
+            ///</summary>
+            ///<param name="sKey" type="String">The input being filtered on - each input has its own timer</param>
+            ///<param name="fnFilter" type="Function">The filtering to run</param>
+            if (oFunctionTimeouts[sKey] != null)
+                clearTimeout(oFunctionTimeouts[sKey]);
+            if (!oTable.fnSettings().oFeatures.bServerSide || !properties.iFilteringDelay) {
+                oFunctionTimeouts[sKey] = null;
+                fnFilter();
+                return;
+            }
+            oFunctionTimeouts[sKey] = setTimeout(function () {
+                oFunctionTimeouts[sKey] = null;
+                fnFilter();
+            }, properties.iFilteringDelay);
+        }
+
         function _fnGetColumnValues(oSettings, iColumn, bUnique, bFiltered, bIgnoreEmpty) {
             ///<summary>
             ///Return values in the column
@@ -154,8 +175,11 @@
                         }
                     }
                     /* Filter on the column (the index) of this element */
-                    oTable.fnFilter(this.value, _fnColumnIndex(index), regex, smart); //Issue 37
-                    fnOnFiltered();
+                    var value = this.value;
+                    _fnDebounce('column-' + index, function () {
+                        oTable.fnFilter(value, _fnColumnIndex(index), regex, smart); //Issue 37
+                        fnOnFiltered();
+                    });
                 });
             }
 
@@ -234,8 +258,10 @@
                 if (iMin != 0 && iMax != 0 && iMin > iMax)
                     return;
 
-                oTable.fnDraw();
-                fnOnFiltered();
+                _fnDebounce(sFromId, function () {
+                    oTable.fnDraw();
+                    fnOnFiltered();
+                });
             });
 
 
@@ -772,7 +798,11 @@
                         }
                     }
                     else {
-                        $.getJSON(sSource, aoData, function (json) {
+                        //Abort the previous draw's request - its response would be out of date
+                        var oSettings = oTable.fnSettings();
+                        if (oSettings.jqXHR && oSettings.jqXHR.readyState != 4)
+                            oSettings.jqXHR.abort();
+                        oSettings.jqXHR = $.getJSON(sSource, aoData, function (json) {
                             fnCallback(json)
                         });
                     }
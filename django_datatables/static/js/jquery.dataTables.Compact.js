@@ -0,0 +1,97 @@
+(function($) {
+/*
+ * Compact (columnar) responses - DatatableView sends raw values per column along with a
+ * renderer for each (see Widget.client_renderer) when asked for sFormat=columnar, and the
+ * markup is built here rather than on the server.
+ */
+var fnEscape = function ( s ) {
+    return String( s === null || s === undefined ? '' : s ).replace( /&/g, '&amp;' ).replace( /</g, '&lt;' )
+        .replace( />/g, '&gt;' ).replace( /"/g, '&quot;' ).replace( /'/g, '&#39;' );
+};
+
+var fnAttrs = function ( oAttrs ) {
+    var s = '';
+    for ( var sKey in oAttrs ) {
+        if ( oAttrs.hasOwnProperty( sKey ) ) s += ' ' + sKey + '="' + fnEscape( oAttrs[sKey] ) + '"';
+    }
+    return s;
+};
+
+/*
+ * Renderers by Widget.client_type - each takes the column's renderer and a value from
+ * Widget.client_value and returns the same markup as Widget.render.
+ */
+$.fn.dataTableExt.oCompactRenderers = {
+    'text': function ( oRenderer, mValue ) {
+        var sRaw = $.isArray( mValue ) ? mValue[0] : mValue;
+        var sDisplay = sRaw;
+        if ( $.isArray( mValue ) ) sDisplay = mValue[1];
+        else if ( oRenderer.oChoices && oRenderer.oChoices.hasOwnProperty( sRaw ) ) sDisplay = oRenderer.oChoices[sRaw];
+        return '<span' + fnAttrs( oRenderer.oAttrs ) + ' data-raw="' + fnEscape( sRaw ) + '">' + sDisplay + '</span>';
+    },
+    'span': function ( oRenderer, mValue ) {
+        var sTip = oRenderer.sTipIcon ? ' <i class="' + oRenderer.sTipIcon + '"></i>' : '';
+        return '<span' + fnAttrs( oRenderer.oAttrs ) + ' data-raw="' + fnEscape( mValue[0] ) + '"><span class="' +
+            fnEscape( oRenderer.sSpanClass ) + ' ' + fnEscape( mValue[2] ) + '">' + mValue[1] + '</span>' + sTip + '</span>';
+    },
+    'url': function ( oRenderer, mValue ) {
+        if ( mValue !== null ) {
+            mValue = '<a href="' + mValue + '" target="' + oRenderer.sTarget + '">' + mValue + '</a>';
+        }
+        return $.fn.dataTableExt.oCompactRenderers.text( oRenderer, mValue === null ? '' : mValue );
+    },
+    'link': function ( oRenderer, mValue ) {
+        var sText = fnEscape( mValue[0] );
+        if ( mValue[1] ) sText = '<a href="' + fnEscape( mValue[1] ) + '">' + sText + '</a>';
+        return '<span' + fnAttrs( oRenderer.oAttrs ) + ' >' + sText + ( mValue[2] || '' ) + '</span>';
+    }
+};
+
+/*
+ * Function: fnExpandCompact
+ * Purpose:  Expand the oColumnar part of a compact response into aaData.
+ * Returns:  object: json with aaData filled in
+ */
+$.fn.dataTableExt.fnExpandCompact = function ( json ) {
+    var oColumnar = json.oColumnar;
+    if ( !oColumnar ) return json;
+    var aoColumns = oColumnar.aoColumns, aaColumnData = oColumnar.aaColumnData;
+    var iRows = aaColumnData.length ? aaColumnData[0].length : 0, iWidth = 0;
+    for ( var j=0; j<aoColumns.length; j++ ) iWidth = Math.max( iWidth, aoColumns[j].iColumn + 1 );
+    var aaData = [];
+    for ( var i=0; i<iRows; i++ ) {
+        var oRow = {};
+        for ( var c=0; c<iWidth; c++ ) oRow[c] = '';
+        if ( oColumnar.asRowId && oColumnar.asRowId[i] !== null ) oRow.DT_RowId = oColumnar.asRowId[i];
+        if ( oColumnar.asRowClass && oColumnar.asRowClass[i] !== null ) oRow.DT_RowClass = oColumnar.asRowClass[i];
+        for ( var j=0; j<aoColumns.length; j++ ) {
+            var oRenderer = aoColumns[j].oRenderer, mValue = aaColumnData[j][i];
+            oRow[aoColumns[j].iColumn] += oRenderer ? $.fn.dataTableExt.oCompactRenderers[oRenderer.sType]( oRenderer, mValue ) : mValue;
+        }
+        aaData.push( oRow );
+    }
+    json.aaData = aaData;
+    delete json.oColumnar;
+    return json;
+};
+
+/*
+ * Function: fnCompactServerData
+ * Purpose:  fnServerData that asks for the compact format and expands it before drawing.
+ * Usage:    $('#table').dataTable({'bServerSide': true, 'fnServerData': $.fn.dataTableExt.fnCompactServerData});
+ */
+$.fn.dataTableExt.fnCompactServerData = function ( sSource, aoData, fnCallback, oSettings ) {
+    aoData.push( { 'name': 'sFormat', 'value': 'columnar' } );
+    if ( oSettings.jqXHR && oSettings.jqXHR.readyState != 4 ) {
+        oSettings.jqXHR.abort();
+    }
+    oSettings.jqXHR = $.ajax( {
+        'dataType': 'json',
+        'type': oSettings.sServerMethod,
+        'url': sSource,
+        'data': aoData,
+        'success': function ( json ) {
+            fnCallback( $.fn.dataTableExt.fnExpandCompact( json ) );
+        }
+    } );
+}}(jQuery));
@@ -0,0 +1,36 @@
+(function($) {
+/*
+ * Function: fnETagServerData
+ * Purpose:  fnServerData for reports with Meta.data_version - sends the ETag of the last
+ *           response back as If-None-Match and, when the server answers 304 Not Modified,
+ *           redraws the last response rather than having the server rebuild it. Aborts a
+ *           request still in flight when a newer draw starts.
+ * Usage:    $('#table').dataTable({'bServerSide': true, 'fnServerData': $.fn.dataTableExt.fnETagServerData});
+ */
+$.fn.dataTableExt.fnETagServerData = function ( sSource, aoData, fnCallback, oSettings ) {
+    var oLast = oSettings._oETag || {};
+    var sEcho;
+    for ( var i=0, c=aoData.length; i<c; i++ ) {
+        if ( aoData[i].name == 'sEcho' ) sEcho = aoData[i].value;
+    }
+    if ( oSettings.jqXHR && oSettings.jqXHR.readyState != 4 ) {
+        oSettings.jqXHR.abort();
+    }
+    oSettings.jqXHR = $.ajax( {
+        'dataType': 'json',
+        'type': oSettings.sServerMethod,
+        'url': sSource,
+        'data': aoData,
+        'headers': oLast.sETag ? { 'If-None-Match': oLast.sETag } : {},
+        'success': function ( json, sStatus, jqXHR ) {
+            if ( jqXHR.status == 304 && oLast.json ) {
+                json = $.extend( {}, oLast.json );
+                json.sEcho = sEcho;
+            }
+            else {
+                oSettings._oETag = { 'sETag': jqXHR.getResponseHeader( 'ETag' ), 'json': json };
+            }
+            fnCallback( json );
+        }
+    } );
+}}(jQuery));
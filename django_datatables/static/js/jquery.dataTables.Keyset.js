@@ -0,0 +1,27 @@
+(function($) {
+/*
+ * Function: fnKeysetServerData
+ * Purpose:  fnServerData for reports with Meta.keyset - remembers the sNextCursor returned
+ *           with each draw and sends it back as sCursor, so moving to the next page is an
+ *           index seek rather than an OFFSET. The server ignores cursors for any other page.
+ * Usage:    $('#table').dataTable({'bServerSide': true, 'fnServerData': $.fn.dataTableExt.fnKeysetServerData});
+ */
+$.fn.dataTableExt.fnKeysetServerData = function ( sSource, aoData, fnCallback, oSettings ) {
+    if ( oSettings._sNextCursor ) {
+        aoData.push( { 'name': 'sCursor', 'value': oSettings._sNextCursor } );
+    }
+    // Anything in flight is for an older draw.
+    if ( oSettings.jqXHR && oSettings.jqXHR.readyState != 4 ) {
+        oSettings.jqXHR.abort();
+    }
+    oSettings.jqXHR = $.ajax( {
+        'dataType': 'json',
+        'type': oSettings.sServerMethod,
+        'url': sSource,
+        'data': aoData,
+        'success': function ( json ) {
+            oSettings._sNextCursor = json.sNextCursor || null;
+            fnCallback( json );
+        }
+    } );
+}}(jQuery));
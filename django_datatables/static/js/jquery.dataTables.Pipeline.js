@@ -0,0 +1,78 @@
+(function($) {
+/*
+ * Function: fnPipelineServerData
+ * Purpose:  Returns an fnServerData that asks DatatableView for iPages pages at a time (sent as
+ *           iPrefetchPages) and draws the following pages from that response without another
+ *           request. Filtering, sorting or changing the page length starts a new pipeline.
+ *           A request still in flight when a newer draw starts is aborted, and the response to
+ *           a superseded draw is never drawn.
+ * Usage:    $('#table').dataTable({'bServerSide': true, 'fnServerData': $.fn.dataTableExt.fnPipelineServerData(5)});
+ */
+$.fn.dataTableExt.fnPipelineServerData = function ( iPages ) {
+    iPages = iPages || 5;
+    return function ( sSource, aoData, fnCallback, oSettings ) {
+        var oCache = oSettings._oPipeline = oSettings._oPipeline || { 'iRequest': 0 };
+        var sEcho, iStart = 0, iLength = -1, asKey = [];
+        for ( var i=0, c=aoData.length; i<c; i++ ) {
+            if ( aoData[i].name == 'sEcho' ) sEcho = aoData[i].value;
+            else if ( aoData[i].name == 'iDisplayStart' ) iStart = aoData[i].value * 1;
+            else if ( aoData[i].name == 'iDisplayLength' ) iLength = aoData[i].value * 1;
+            else asKey.push( aoData[i].name + '=' + aoData[i].value );
+        }
+        var sKey = asKey.join( '&' ) + '&iDisplayLength=' + iLength;
+
+        if ( oCache.json && oCache.sKey == sKey && iLength != -1 &&
+             iStart >= oCache.iStart && iStart < oCache.iEnd &&
+             ( iStart + iLength <= oCache.iEnd || oCache.bLast ) ) {
+            // The page is in the pipeline - draw it from there.
+            var json = $.extend( {}, oCache.json );
+            json.sEcho = sEcho;
+            json.aaData = oCache.json.aaData.slice( iStart - oCache.iStart, iStart - oCache.iStart + iLength );
+            fnCallback( json );
+            return;
+        }
+
+        // Anything in flight is for an older draw.
+        if ( oSettings.jqXHR && oSettings.jqXHR.readyState != 4 ) {
+            oSettings.jqXHR.abort();
+        }
+        var iRequest = ++oCache.iRequest;
+        if ( iLength != -1 ) {
+            aoData.push( { 'name': 'iPrefetchPages', 'value': iPages } );
+        }
+        oSettings.jqXHR = $.ajax( {
+            'dataType': 'json',
+            'type': oSettings.sServerMethod,
+            'url': sSource,
+            'data': aoData,
+            'success': function ( json ) {
+                if ( iRequest != oCache.iRequest ) {
+                    return;
+                }
+                oCache.sKey = sKey;
+                oCache.iStart = iStart;
+                // The server may send fewer pages than asked for (it caps them at
+                // max_prefetch_pages) so the pipeline ends where the rows do.
+                oCache.iEnd = iStart + json.aaData.length;
+                oCache.bLast = !json.bApproximateTotalDisplayRecords && oCache.iEnd >= json.iTotalDisplayRecords;
+                oCache.json = json;
+                if ( iLength != -1 ) {
+                    json = $.extend( {}, json );
+                    json.aaData = oCache.json.aaData.slice( 0, iLength );
+                }
+                fnCallback( json );
+            }
+        } );
+    };
+};
+
+/*
+ * Function: fnClearPipeline
+ * Purpose:  Drop the pages held by fnPipelineServerData, ie.. after the data has been edited.
+ * Usage:    oTable.fnClearPipeline();
+ */
+$.fn.dataTableExt.oApi.fnClearPipeline = function ( oSettings ) {
+    if ( oSettings._oPipeline ) {
+        oSettings._oPipeline.json = null;
+    }
+}}(jQuery));
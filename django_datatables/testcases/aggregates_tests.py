@@ -0,0 +1,59 @@
+from decimal import Decimal
+from django.db.models import Count, StdDev, Sum
+from django.utils import unittest
+import django_datatables
+from django_datatables import aggregates
+from django_datatables.testcases import TestReport
+
+class AggregatesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.report = TestReport()
+
+    def test_get_function(self):
+        field = django_datatables.IntegerField(aggregate=True)
+        field.name = 'calc'
+        self.assertEquals(aggregates.get_function(field), 'sum')
+        field.aggregate = 'distinct_count'
+        self.assertEquals(aggregates.get_function(field), 'distinct_count')
+        field.aggregate = Sum('calc')
+        self.assertEquals(aggregates.get_function(field), 'sum')
+        field.aggregate = Count('calc', distinct=True)
+        self.assertEquals(aggregates.get_function(field), 'distinct_count')
+        field.aggregate = 'median'
+        self.assertRaises(ValueError, aggregates.get_function, field)
+
+    def test_accumulators(self):
+        values = [6, Decimal('7'), None, 8, Decimal('16.2'), 8]
+        results = {}
+        for name, accumulator_class in aggregates.ACCUMULATORS.iteritems():
+            accumulator = accumulator_class()
+            for value in values:
+                accumulator.add(value)
+            results[name] = accumulator.result()
+        self.assertEquals(results, {
+            'sum': Decimal('45.2'),
+            'avg': Decimal('9.04'),
+            'min': 6,
+            'max': Decimal('16.2'),
+            'count': 5,
+            'distinct_count': 4,
+        })
+
+    def test_empty(self):
+        self.assertEquals(aggregates.aggregate(self.report, []), {'calc': None})
+
+    def test_streamed(self):
+        self.assertEquals(
+            aggregates.aggregate(self.report, self.report.queryset()),
+            {'calc': Decimal('37.2')}
+        )
+
+    def test_database_only_aggregate(self):
+        class DeviationReport(TestReport):
+            deviation = django_datatables.IntegerField(aggregate=StdDev('calc'))
+
+        self.assertEquals(
+            aggregates.aggregate(DeviationReport(), self.report.queryset()),
+            {'calc': Decimal('37.2'), 'deviation': None}
+        )
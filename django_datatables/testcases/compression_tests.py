@@ -0,0 +1,48 @@
+import gzip
+import cStringIO
+from django.utils import unittest
+from django_datatables.compression import CompressedWriter, accepts_gzip, gzip_iter
+
+class Request(object):
+
+    def __init__(self, accept_encoding):
+        self.META = {'HTTP_ACCEPT_ENCODING': accept_encoding}
+
+class CompressionTestCase(unittest.TestCase):
+
+    def test_accepts_gzip(self):
+        self.assertTrue(accepts_gzip(Request('gzip, deflate')))
+        self.assertTrue(accepts_gzip(Request('br;q=1.0, gzip;q=0.8')))
+        self.assertFalse(accepts_gzip(Request('gzip;q=0, deflate')))
+        self.assertFalse(accepts_gzip(Request('')))
+        self.assertFalse(accepts_gzip(Request('gzip;q=.')))
+        self.assertFalse(accepts_gzip(Request('gzip;q=1.2.3')))
+        self.assertFalse(accepts_gzip(Request('gzip;q=0, *')))
+        self.assertTrue(accepts_gzip(Request('deflate, *')))
+
+    def test_gzip_iter(self):
+        data = ''.join(gzip_iter(['a,b\r\n', '1,2\r\n']))
+        self.assertEquals(gzip.GzipFile(fileobj=cStringIO.StringIO(data)).read(), 'a,b\r\n1,2\r\n')
+
+    def test_members_can_be_truncated(self):
+        handle = cStringIO.StringIO()
+        output = CompressedWriter(handle, 'gzip')
+        output.write('a,b\r\n')
+        output.finish_member()
+        offset = handle.tell()
+        output.write('lost\r\n')
+        output.close()
+        # Resume from the end of the first member.
+        handle.truncate(offset)
+        handle.seek(offset)
+        output = CompressedWriter(handle, 'gzip')
+        output.write('1,2\r\n')
+        output.close()
+        self.assertEquals(gzip.GzipFile(fileobj=cStringIO.StringIO(handle.getvalue())).read(), 'a,b\r\n1,2\r\n')
+
+    def test_uncompressed(self):
+        handle = cStringIO.StringIO()
+        output = CompressedWriter(handle)
+        output.write('a,b\r\n')
+        output.close()
+        self.assertEquals(handle.getvalue(), 'a,b\r\n')
@@ -0,0 +1,34 @@
+import os
+import shutil
+import tempfile
+from django.utils import unittest
+from django_datatables.exports import write_csv, find_resumable, partial_path, checkpoint_path, save_checkpoint
+from django_datatables.testcases import TestReport
+
+class ExportsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'test-report-20240101000000.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_write_csv(self):
+        self.assertEquals(write_csv(TestReport(), self.path), 4)
+        self.assertTrue(os.path.exists(self.path))
+        self.assertFalse(os.path.exists(partial_path(self.path)))
+        self.assertFalse(os.path.exists(checkpoint_path(self.path)))
+
+    def test_find_resumable(self):
+        self.assertEquals(find_resumable(self.directory, 'test-report-', '.csv'), None)
+        open(partial_path(self.path), 'wb').close()
+        save_checkpoint(self.path, {'values': None, 'offset': 0, 'rows': 0})
+        self.assertEquals(find_resumable(self.directory, 'test-report-', '.csv'), self.path)
+
+    def test_resume_restarts_unordered_report(self):
+        open(partial_path(self.path), 'wb').write('stale')
+        save_checkpoint(self.path, {'values': None, 'offset': 5, 'rows': 0})
+        self.assertEquals(write_csv(TestReport(), self.path, resume=True), 4)
+        self.assertTrue(open(self.path, 'rb').read().startswith('Name,'))
+        self.assertFalse(os.path.exists(checkpoint_path(self.path)))
@@ -0,0 +1,79 @@
+from django.db import connections, DatabaseError
+from django.test import TestCase
+from django.utils import unittest
+import django_datatables
+from django_datatables.models import ReportSnapshot
+from django_datatables.search import SqliteFTS5Search
+from django_datatables.testcases import TestReport
+
+class SnapshotSearchReport(django_datatables.Report):
+    """
+    A report over a model of this app, so searches run against the database.
+    """
+    report = django_datatables.CharField(filter=True)
+    path = django_datatables.CharField(filter=True)
+
+    class Meta:
+        search = SqliteFTS5Search()
+
+    def queryset(self):
+        return ReportSnapshot.objects.order_by('pk')
+
+class SearchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.report = TestReport()
+
+    def test_search_lookups(self):
+        self.assertEquals(self.report._meta.search_lookups, ('name', 'status', 'calc'))
+
+    def test_empty_term(self):
+        qs = self.report.queryset()
+        self.assertTrue(self.report.search(qs, '') is qs)
+
+    def test_fts5_query(self):
+        backend = SqliteFTS5Search()
+        self.assertEquals(backend.get_query('john doe'), '"john"* "doe"*')
+        self.assertEquals(backend.get_query('say "hi" OR'), '"say"* """hi"""* "OR"*')
+        self.assertEquals(backend.get_query('  '), '')
+
+class SqliteFTS5SearchTestCase(TestCase):
+
+    def setUp(self):
+        connection = connections['default']
+        if connection.vendor != 'sqlite':
+            self.skipTest('SqliteFTS5Search requires sqlite.')
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('CREATE VIRTUAL TABLE "fts5_check" USING fts5(value)')
+                cursor.execute('DROP TABLE "fts5_check"')
+        except DatabaseError:
+            self.skipTest('sqlite was built without FTS5.')
+        self.report = SnapshotSearchReport()
+        self.backend = self.report._meta.search
+        self.sales = ReportSnapshot.objects.create(report='reports.sales.Report', path='/tmp/sales.json.gz')
+        self.sales_daily = ReportSnapshot.objects.create(report='reports.sales_daily.Report', path='/tmp/daily.json.gz')
+        self.calls = ReportSnapshot.objects.create(report='reports.calls.Report', path='/tmp/calls.json.gz')
+        self.backend.build(self.report)
+
+    def tearDown(self):
+        with connections['default'].cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS "%s"' % self.backend.get_table(ReportSnapshot))
+
+    def search(self, term):
+        return list(self.backend.search(self.report, self.report.queryset(), term))
+
+    def test_search(self):
+        self.assertEquals(self.search('calls'), [self.calls])
+
+    def test_search_prefix(self):
+        self.assertEquals(self.search('sal'), [self.sales, self.sales_daily])
+
+    def test_search_words(self):
+        self.assertEquals(self.search('sales daily'), [self.sales_daily])
+
+    def test_search_no_match(self):
+        self.assertEquals(self.search('refunds'), [])
+
+    def test_search_syntax(self):
+        self.assertEquals(self.search('calls OR "'), [])
@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+from django.utils import unittest
+from django.core.exceptions import ImproperlyConfigured
+from django.test.utils import override_settings
+from django_datatables.snapshots import Snapshot, gather_rows, get_snapshot_root, is_request_dependent
+from django_datatables.testcases import TestReport
+
+class SnapshotTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.report = TestReport()
+        self.snapshot = Snapshot(gather_rows(self.report), self.report.get_aggregates())
+
+    def test_filter_term(self):
+        rows = self.snapshot.filter(self.report, 'doe')
+        self.assertEquals([row['name'] for row in rows], ['John Doe', 'Jane Doe'])
+
+    def test_filter_column_choices(self):
+        rows = self.snapshot.filter(self.report, column_terms=[(self.report.field('status'), 'inactive')])
+        self.assertEquals([row['name'] for row in rows], ['Jesus Christ'])
+
+    def test_order(self):
+        rows = self.snapshot.order(self.report, self.snapshot.rows, [('status', False), ('dob', True)])
+        self.assertEquals([row['name'] for row in rows], ['Jane Doe', 'John Doe', 'Billy Boe', 'Jesus Christ'])
+
+    def test_save_load(self):
+        path = os.path.join(tempfile.mkdtemp(), 'snapshots', 'test.json.gz')
+        try:
+            self.snapshot.save(path)
+            snapshot = Snapshot.load(path)
+        finally:
+            shutil.rmtree(os.path.dirname(os.path.dirname(path)))
+        self.assertEquals(snapshot.rows, self.snapshot.rows)
+        self.assertEquals(snapshot.aggregates, self.snapshot.aggregates)
+
+    @override_settings(MEDIA_ROOT='/srv/media', DATATABLES_SNAPSHOT_ROOT='/srv/media/snapshots')
+    def test_snapshot_root_not_served(self):
+        self.assertRaises(ImproperlyConfigured, get_snapshot_root)
+
+    def test_is_request_dependent(self):
+        class UserReport(TestReport):
+            def set_request(self, request):
+                super(UserReport, self).set_request(request)
+                self.user = request.user
+
+        self.assertFalse(is_request_dependent(self.report))
+        self.assertTrue(is_request_dependent(UserReport()))
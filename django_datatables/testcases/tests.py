@@ -5,6 +5,11 @@ import django_datatables
 from django_datatables.testcases import TestReport
 from decimal import Decimal
 
+class RelatedReport(django_datatables.Report):
+    name = django_datatables.CharField()
+    owner = django_datatables.CharField(name='account__owner__name')
+    tags = django_datatables.CommaSeparatedForeignKey(object)
+
 class ReportTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -134,4 +139,68 @@ class ReportTestCase(unittest.TestCase):
         self.assertEquals(
             self.report.get_aggregates(),
             {'calc': Decimal('37.2')}
-        )
\ No newline at end of file
+        )
+
+    def test_related_lookups(self):
+        self.assertEquals(self.report._meta.select_related, ())
+        self.assertEquals(self.report._meta.prefetch_related, ())
+        self.assertEquals(RelatedReport._meta.select_related, ('account__owner', ))
+        self.assertEquals(RelatedReport._meta.prefetch_related, ('tags', ))
+
+    def test_prepare_queryset_list(self):
+        qs = self.report.queryset()
+        self.assertTrue(self.report.prepare_queryset(qs) is qs)
+
+    def test_projection_lookups(self):
+        self.assertEquals(RelatedReport._meta.projection, None)
+        self.assertEquals(
+            [lookup for lookup, strict in RelatedReport._meta.projection_lookups if strict],
+            ['name', 'account__owner__name', 'tags']
+        )
+
+    def test_cache_key(self):
+        self.assertTrue(self.report.cache_key().startswith('report-django_datatables.testcases.TestReport-'))
+        self.assertNotEqual(self.report.cache_key(1), self.report.cache_key(2))
+        self.assertEquals(self.report.cache_vary(), (None, ))
+
+    def test_supports_writer(self):
+        self.assertTrue(self.report.supports_writer(django_datatables.HtmlWriter))
+        self.assertTrue(self.report.supports_writer('UnicodeCsvWriter'))
+        self.assertFalse(self.report.supports_writer('JsonWriter'))
+
+    def test_descriptor(self):
+        descriptor = django_datatables.ReportDescriptor.for_report_class(TestReport)
+        self.assertTrue(descriptor is django_datatables.ReportDescriptor.for_report_class(TestReport))
+        self.assertEquals(descriptor.field('status'), self.report.field('status'))
+        self.assertEquals(descriptor.field('missing'), None)
+        self.assertEquals(descriptor.field_index['dob'], 2)
+        self.assertTrue(descriptor.supports_writer('HtmlWriter'))
+
+    def test_field_indexes(self):
+        self.assertEquals(self.report.field_index('calc'), 4)
+        self.assertTrue(self.report.field_exists('dob'))
+        self.assertFalse(self.report.field_exists('missing'))
+        self.assertRaises(ValueError, self.report.field_index, 'missing')
+
+    def test_field_subsets(self):
+        self.assertEquals([field.name for field in self.report._meta.filter_fields], ['name', 'status', 'calc'])
+        self.assertEquals([field.name for field in self.report._meta.aggregate_fields], ['calc'])
+        self.assertTrue(self.report.fields('filter', True) is self.report.fields('filter', True))
+
+    def test_field_lookup_types(self):
+        field = django_datatables.CharField(lookup_type='istartswith', numeric_with='pk')
+        field.set_attributes_from_name('name')
+        self.assertEquals(field.get_qs_for_term('Jo').children, [('name__istartswith', 'Jo')])
+        self.assertEquals(field.get_qs_for_term(' 42').children, [('pk', 42)])
+        field = django_datatables.CharField(lookup_type=django_datatables.LOOKUP_EXACT_THEN_PREFIX)
+        field.set_attributes_from_name('name')
+        self.assertEquals(field.get_qs_for_term('Jo').children, [('name__istartswith', 'Jo')])
+        self.assertEquals(self.report.field('status').get_lookup_type(True), 'exact')
+
+    def test_data_version(self):
+        self.assertEquals(self.report.data_version(), None)
+        self.report._meta.data_version = lambda report: 42
+        try:
+            self.assertEquals(self.report.data_version(), 42)
+        finally:
+            self.report._meta.data_version = None
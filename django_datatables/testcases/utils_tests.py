@@ -0,0 +1,39 @@
+import json
+from datetime import date
+from decimal import Decimal
+from django.conf import settings
+from django.utils import unittest
+from django_datatables.utils import lookup_value, json_safe, get_chunk_size, iter_queryset, CHUNK_SIZE
+from django_datatables.testcases import TestReport
+
+class UtilsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.item = TestReport().queryset()[0]
+
+    def test_lookup_value_object(self):
+        self.assertEquals(lookup_value(self.item, 'name'), 'John Doe')
+        self.assertEquals(lookup_value(self.item, 'name__missing'), None)
+
+    def test_lookup_value_dict(self):
+        self.assertEquals(lookup_value({'account__name': 'Acme'}, 'account__name'), 'Acme')
+        self.assertEquals(lookup_value({}, 'account__name'), None)
+
+    def test_json_safe(self):
+        self.assertEquals(json_safe(date(1980, 5, 6)), '1980-05-06')
+        self.assertEquals(json_safe(Decimal('11.2')), '11.2')
+        self.assertEquals(json_safe(5), 5)
+
+    def test_serializers(self):
+        from django_datatables import serializers
+        data = {0: Decimal('11.2'), 'dob': date(1980, 5, 6), 'rows': [(1, None)]}
+        self.assertEquals(serializers.coerce(data), {'0': '11.2', 'dob': '1980-05-06', 'rows': [[1, None]]})
+        self.assertEquals(json.loads(serializers.dumps(data, 'json')), serializers.coerce(data))
+
+    def test_iter_queryset_list(self):
+        items = TestReport().queryset()
+        self.assertEquals(list(iter_queryset(items)), items)
+
+    def test_get_chunk_size(self):
+        self.assertEquals(get_chunk_size([], 10), 10)
+        self.assertEquals(get_chunk_size([]), getattr(settings, 'DATATABLES_CHUNK_SIZE', CHUNK_SIZE))
@@ -1,6 +1,7 @@
 import tempfile, os, logging
 from django.conf import settings
 from datetime import date
+from decimal import Decimal
 from django.utils import unittest
 from django_toolkit.csv.unicode import UnicodeReader
 from django_datatables.writers.csv_writers import UnicodeCsvWriter
@@ -33,4 +34,28 @@ class CsvWriterTestCase(unittest.TestCase):
                    "Billy Boe,active,1965-01-01,30% (3/10),8\r\n" \
                    "Jesus Christ,inactive,1946-12-25,50% (11.2/22.4),16.2\r\n"
         self.assertEquals(contents, expected)
-        os.unlink(path)
\ No newline at end of file
+        os.unlink(path)
+
+    def test_iter_rows(self):
+        rows = list(self.writer.iter_rows())
+        self.assertEquals(len(rows), 5)
+        self.assertEquals(rows[0], ['Name', 'Status', 'Birthdate', 'Successful Calls', 'Calc'])
+        self.assertEquals(rows[1], [u'John Doe', u'active', u'1980-05-06', u'50% (1/2)', u'6'])
+
+    def test_iter_csv_matches_write(self):
+        path = tempfile.mktemp('.csv')
+        self.writer.write(path)
+        contents = open(path, 'rb').read()
+        self.assertEquals(''.join(UnicodeCsvWriter(self.report).iter_csv()), contents)
+        os.unlink(path)
+
+    def test_iter_rows_totals(self):
+        rows = list(self.writer.iter_rows(totals=True))
+        self.assertEquals(len(rows), 6)
+        self.assertEquals(rows[-1], [u'', u'', u'', u'', u'37.2'])
+        self.assertEquals(self.writer.aggregates(), {'calc': Decimal('37.2')})
+
+    def test_iter_rows_without_header(self):
+        rows = list(self.writer.iter_rows(header=False))
+        self.assertEquals(len(rows), 4)
+        self.assertEquals(rows[0][0], u'John Doe')
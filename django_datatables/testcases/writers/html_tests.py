@@ -0,0 +1,45 @@
+import logging
+import django_datatables
+from django.utils import unittest
+from django_datatables.writers.base import RowPlan
+from django_datatables.writers.html import HtmlWriter
+from django_datatables.testcases import TestReport
+
+logger = logging.getLogger(__name__)
+
+class HtmlWriterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.report = TestReport()
+        self.writer = HtmlWriter(self.report)
+
+    def test_row_plan_cached(self):
+        self.assertTrue(RowPlan.for_report(self.report) is RowPlan.for_report(TestReport()))
+
+    def test_row_plan_columns(self):
+        plan = RowPlan.for_report(self.report)
+        self.assertEquals(plan.width, 5)
+        self.assertEquals([column for column, field in plan.columns], [0, 1, 2, 3, 4])
+
+    def test_as_json(self):
+        rows = self.writer.as_json(self.report.queryset())
+        self.assertEquals(len(rows), 4)
+        self.assertEquals(rows[0].keys(), [0, 1, 2, 3, 4])
+        self.assertTrue('John Doe' in rows[0][0])
+
+    def test_as_columnar(self):
+        columnar = self.writer.as_columnar(self.report.queryset())
+        self.assertEquals([column['iColumn'] for column in columnar['aoColumns']], [0, 1, 2, 3, 4])
+        self.assertEquals(columnar['aaColumnData'][0], [u'John Doe', u'Jane Doe', u'Billy Boe', u'Jesus Christ'])
+        status = columnar['aoColumns'][1]['oRenderer']
+        self.assertEquals(status['sType'], 'text')
+        self.assertEquals(status['oChoices']['active'], u'Active')
+        self.assertEquals(columnar['aaColumnData'][1][0], u'active')
+        # PercentWidget renders its own markup so is rendered server side.
+        self.assertEquals(columnar['aoColumns'][3]['oRenderer'], None)
+        self.assertTrue('<span' in columnar['aaColumnData'][3][0])
+
+    def test_foreign_key_client_value_none(self):
+        from django_datatables.widgets import ForeignKeyWidget
+        widget = ForeignKeyWidget(django_datatables.ForeignKey(object))
+        self.assertEquals(widget.client_value(self.report, None, None), [u'', None])
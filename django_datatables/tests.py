@@ -1,2 +1,9 @@
 from django_datatables.testcases.tests import ReportTestCase
-from django_datatables.testcases.writers.csv_tests import CsvWriterTestCase
\ No newline at end of file
+from django_datatables.testcases.writers.csv_tests import CsvWriterTestCase
+from django_datatables.testcases.writers.html_tests import HtmlWriterTestCase
+from django_datatables.testcases.utils_tests import UtilsTestCase
+from django_datatables.testcases.snapshots_tests import SnapshotTestCase
+from django_datatables.testcases.search_tests import SearchTestCase
+from django_datatables.testcases.aggregates_tests import AggregatesTestCase
+from django_datatables.testcases.compression_tests import CompressionTestCase
+from django_datatables.testcases.exports_tests import ExportsTestCase
@@ -0,0 +1,254 @@
+import datetime
+from decimal import Decimal
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Q
+from django.db.models.base import Model
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.fields import FieldDoesNotExist
+from django.db.models.query import QuerySet
+
+# The default number of rows fetched at a time when iterating a queryset.
+CHUNK_SIZE = 2000
+# Rough in-memory sizes (bytes) of a model instance and of each of its
+# fields, used to turn DATATABLES_MEMORY_BUDGET into a chunk size.
+INSTANCE_SIZE = 512
+FIELD_SIZE = 128
+
+def is_model_queryset(qs):
+    """
+    Return True if qs is a QuerySet that yields model instances (ie.. not a
+    list, iterator or a values()/values_list() queryset).
+    """
+    return isinstance(qs, QuerySet) and getattr(qs, '_fields', None) is None
+
+def resolve_related_lookup(model, lookup):
+    """
+    Walk lookup across the relations of model.
+
+    Returns a tuple of (path, many) where path is the longest prefix of lookup
+    that consists only of relations and many is True if any of those relations
+    is a to-many relation (and therefore needs prefetch_related rather than
+    select_related). path is an empty string if lookup doesn't start with a
+    relation.
+    """
+    path, many = [], False
+    for part in lookup.split(LOOKUP_SEP):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            break
+        if not field.is_relation or field.related_model is None:
+            # Either a plain column or a generic relation we can't follow.
+            break
+        many = many or field.many_to_many or field.one_to_many
+        path.append(part)
+        model = field.related_model
+    return LOOKUP_SEP.join(path), many
+
+def resolve_lookup_path(model, lookup):
+    """
+    Resolve lookup (ie.. customer__account__name) against model.
+
+    Returns a tuple of (relations, field, many) where relations is the list of
+    relation lookups crossed to reach the final part (ie.. ['customer',
+    'customer__account']), field is the model field the lookup ends on (None if
+    it doesn't end on a model field, ie.. a property or a method) and many is
+    True if any of the relations is a to-many relation.
+    """
+    relations, many = [], False
+    parts = lookup.split(LOOKUP_SEP)
+    for counter, part in enumerate(parts):
+        if part == 'pk':
+            field = model._meta.pk
+        else:
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                return relations, None, many
+        if (counter + 1) == len(parts):
+            return relations, field, many
+        if not field.is_relation or field.related_model is None:
+            return relations, None, many
+        many = many or field.many_to_many or field.one_to_many
+        relations.append(LOOKUP_SEP.join(parts[:counter + 1]))
+        model = field.related_model
+    return relations, None, many
+
+def get_ordering(qs):
+    """
+    Return the ordering of qs as a list of lookups (ie.. ['-created', 'pk']),
+    or None if it is ordered by anything other than plain lookups.
+    """
+    order_by = list(qs.query.order_by) or list(qs.model._meta.ordering)
+    if not all(isinstance(lookup, basestring) and lookup != '?' for lookup in order_by):
+        return None
+    return order_by
+
+def lookup_value(item, lookup):
+    """
+    Return the value of lookup for item, where item is either a model instance
+    or a dict (ie.. a row from values()). Related objects are returned as their
+    primary key.
+    """
+    if isinstance(item, dict):
+        value = item.get(lookup)
+    else:
+        value = item
+        for part in lookup.split(LOOKUP_SEP):
+            try:
+                value = getattr(value, part)
+            except (AttributeError, ObjectDoesNotExist):
+                return None
+            if value is None:
+                return None
+    if isinstance(value, Model):
+        value = value.pk
+    return value
+
+def seek_q(ordering, values):
+    """
+    Return a Q that matches the rows which come after a row with values when
+    ordered by ordering (ie.. the keyset/seek equivalent of an OFFSET).
+    
+    For ordering ['a', '-b'] this is (a > x) OR (a = x AND b < y).
+    """
+    q = None
+    for counter, lookup in enumerate(ordering):
+        term = Q(**{'%s__%s' % (lookup.lstrip('-'), 'lt' if lookup.startswith('-') else 'gt'): values[counter]})
+        for previous, value in zip(ordering[:counter], values[:counter]):
+            term &= Q(**{previous.lstrip('-'): value})
+        q = term if q is None else q | term
+    return q
+
+def json_safe(value):
+    """
+    Coerce value to something json can serialize and the ORM will accept back
+    as a lookup value.
+    """
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return '%s' % value
+    if isinstance(value, (int, long, float, basestring, bool)) or value is None:
+        return value
+    return u'%s' % value
+
+def get_chunk_size(qs, chunk_size=None):
+    """
+    Return the number of rows of qs to fetch at a time - chunk_size or
+    settings.DATATABLES_CHUNK_SIZE, capped so a chunk of model instances (and
+    their prefetched relations) fits in settings.DATATABLES_MEMORY_BUDGET
+    bytes if that is set.
+    """
+    chunk_size = chunk_size or getattr(settings, 'DATATABLES_CHUNK_SIZE', CHUNK_SIZE)
+    budget = getattr(settings, 'DATATABLES_MEMORY_BUDGET', None)
+    if budget and is_model_queryset(qs):
+        row_size = INSTANCE_SIZE + FIELD_SIZE * len(qs.model._meta.concrete_fields)
+        row_size *= 1 + len(qs._prefetch_related_lookups)
+        chunk_size = max(1, min(chunk_size, budget // row_size))
+    return chunk_size
+
+def is_relation(field):
+    """
+    Is field a relation - field.is_relation on Django >= 1.8.
+    """
+    return getattr(field, 'is_relation', getattr(field, 'rel', None) is not None)
+
+def get_keyset_ordering(qs):
+    """
+    Return the ordering of qs with the primary key appended as a tie breaker
+    if qs can be walked in keyset chunks - ordered only by non null,
+    non relation columns of its own model - otherwise None.
+    """
+    if not isinstance(qs, QuerySet):
+        return None
+    ordering = get_ordering(qs)
+    if ordering is None:
+        return None
+    pk = qs.model._meta.pk
+    unique = False
+    for lookup in ordering:
+        relations, field, many = resolve_lookup_path(qs.model, lookup.lstrip('-'))
+        if relations or field is None or field.null or is_relation(field):
+            # A bare foreign key orders by the related model's ordering, not the column.
+            return None
+        unique = unique or field == pk
+    if not unique:
+        ordering.append('pk')
+    return ordering
+
+def get_total_ordering(qs):
+    """
+    Return the ordering of qs with the primary key appended if it isn't
+    already in it - so the order of rows is the same on every query.
+    """
+    ordering = list(qs.query.order_by) or list(qs.model._meta.ordering)
+    pk = qs.model._meta.pk.name
+    if not any(isinstance(lookup, basestring) and lookup.lstrip('-') in ('pk', pk) for lookup in ordering):
+        ordering.append('pk')
+    return ordering
+
+def iter_chunks(qs, chunk_size):
+    """
+    Generate lists of at most chunk_size items of qs, each fetched by its own
+    query so prefetch_related lookups are done a chunk at a time. Chunks seek
+    past the last item (see seek_q) where qs's ordering allows it. Otherwise
+    the primary keys of qs are streamed in its (total) ordering and each
+    chunk is fetched by them, so there is no OFFSET to walk.
+    """
+    ordering = get_keyset_ordering(qs)
+    if ordering is None:
+        for chunk in _iter_pk_chunks(qs, chunk_size):
+            yield chunk
+        return
+    qs = qs.order_by(*ordering)
+    chunk_qs = qs
+    while True:
+        chunk = list(chunk_qs[:chunk_size])
+        if chunk:
+            yield chunk
+        if len(chunk) < chunk_size:
+            return
+        chunk_qs = qs.filter(seek_q(ordering, [lookup_value(chunk[-1], lookup.lstrip('-')) for lookup in ordering]))
+
+def _iter_pk_chunks(qs, chunk_size):
+    pks = qs.order_by(*get_total_ordering(qs)).prefetch_related(None).values_list('pk', flat=True)
+    chunk = []
+    for pk in pks.iterator():
+        chunk.append(pk)
+        if len(chunk) == chunk_size:
+            yield _fetch_chunk(qs, chunk)
+            chunk = []
+    if chunk:
+        yield _fetch_chunk(qs, chunk)
+
+def _fetch_chunk(qs, pks):
+    """
+    Return the items of qs with pks, in the order of pks.
+    """
+    items = dict((item.pk, item) for item in qs.filter(pk__in=pks))
+    return [items[pk] for pk in pks if pk in items]
+
+def iter_queryset(qs, chunk_size=None):
+    """
+    Iterate over qs without filling its result cache, so items aren't kept
+    alive once they have been processed.
+
+    Querysets are iterated with QuerySet.iterator(), which uses a server side
+    cursor on postgres. iterator() ignores prefetch_related so those
+    querysets are fetched in chunks instead (see iter_chunks). Anything else
+    (lists, sliced querysets) is iterated as is.
+    """
+    if not isinstance(qs, QuerySet):
+        return iter(qs)
+    chunk_size = get_chunk_size(qs, chunk_size)
+    if qs._prefetch_related_lookups:
+        if qs.query.low_mark or qs.query.high_mark is not None:
+            return iter(qs)
+        return (item for chunk in iter_chunks(qs, chunk_size) for item in chunk)
+    try:
+        return qs.iterator(chunk_size=chunk_size)
+    except TypeError:
+        # Django < 2.0 always uses its own chunk size.
+        return qs.iterator()
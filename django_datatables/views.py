@@ -5,7 +5,7 @@ from django.shortcuts import Http404
 from datetime import datetime
 from django.views.generic.base import TemplateView
 from django_datatables_view.base_datatable_view import BaseDatatableView
-from django_datatables import load_report_class, HtmlWriter, JsonWriter
+from django_datatables import get_report_class, HtmlWriter, JsonWriter, ReportDescriptor
 from django.utils.text import slugify
 from django_toolkit.views import AjaxMixin, FileDownloadView
 from django_datatables.helper import report_json_context_helper
@@ -13,8 +13,18 @@ from django.conf import settings
 from django_datatables.forms import DatatableStateSetForm
 from django_datatables.models import DatatableState
 from django.utils.translation import ugettext as _
+from django.utils.encoding import force_text
 from django.views.generic.detail import DetailView
-from django.http.response import HttpResponse
+from django.http.response import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.core.cache import cache
+from django_datatables import caching, serializers
+from django_datatables.counts import ExactCount, EmptyResultSet
+from django_datatables.utils import get_ordering, get_keyset_ordering, lookup_value, seek_q, json_safe
+from django.core import signing
+from django_datatables.snapshots import load_snapshot
+from django_datatables.aggregates import aggregate
+from django_datatables.compression import CompressedWriter, accepts_gzip, gzip_iter
+from django.utils.cache import patch_vary_headers
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +34,19 @@ class DatatableView(BaseDatatableView, AjaxMixin, FileDownloadView):
     report_app = None
     report_name = None
     xsend = False
+    # Stream csv downloads rather than rendering them in memory first.
+    csv_streaming = True
+    # gzip encode csv downloads for clients that accept it.
+    csv_gzip = True
+    # A CountStrategy (instance or class) - overrides the report's Meta.count.
+    count_strategy = None
+    # Serve reports with Meta.materialize set from their latest snapshot.
+    serve_snapshots = True
+    # Whether the last prepare_results() was served from the results cache.
+    results_cache_hit = False
+    # The most pages a request may prefetch with iPrefetchPages (see
+    # jquery.dataTables.Pipeline.js).
+    max_prefetch_pages = 10
     
     def initialize(self, **kwargs):
         if not self.report:
@@ -32,24 +55,79 @@ class DatatableView(BaseDatatableView, AjaxMixin, FileDownloadView):
             if kwargs.has_key('report_name'):
                 self.report_name = kwargs['report_name']
                 
-            self.report = load_report_class(self.report_app, self.report_name)
+            # The report class and its descriptor are resolved once per
+            # process, only the report instance is per request.
+            report_class = get_report_class(self.report_app, self.report_name)
             
-            if not self.report:
+            if not report_class:
                 raise Http404('Report %s.%s does not exist.' % (self.report_app, self.report_name))
     
-            if not self.report.supports_writer(HtmlWriter):
-                raise Http404('Report %s does not support HTML output.' % (self.report.__class__.__module__))
+            descriptor = ReportDescriptor.for_report_class(report_class)
+            if not descriptor.supports_writer(HtmlWriter):
+                raise Http404('Report %s does not support HTML output.' % (report_class.__module__))
+
+            self.report = descriptor.report()
+
+    @property
+    def descriptor(self):
+        return ReportDescriptor.for_report_class(self.report.__class__)
 
     def get(self, request, *args, **kwargs):
         self.initialize(**kwargs)
         self.report.set_request(request)
         if self.is_ajax() or self.accepts_json():
             self.save_state(request)
-            return BaseDatatableView.get(self, request, *args, **kwargs)
+            # Skip building the response altogether if the client already
+            # has it.
+            etag = self.get_etag()
+            if etag and etag in [tag.strip() for tag in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]:
+                response = HttpResponseNotModified()
+            else:
+                response = self.get_json_response_data(request, **kwargs)
+            if etag:
+                response['ETag'] = etag
+            return response
         if self.request.GET.get('csv', False) != False:
             return self.csv(request, *args, **kwargs)
         return TemplateView.get(self, request, *args, **kwargs)
 
+    def get_json_response_data(self, request, **kwargs):
+        """
+        As per BaseDatatableView.get() but serializing the payload with
+        serializers.dumps() - ujson when installed.
+        """
+        try:
+            response = self.get_context_data(**kwargs)
+            if not getattr(self, 'is_clean', False):
+                response = dict(response)
+                if 'result' not in response:
+                    response['result'] = 'ok'
+        except KeyboardInterrupt:
+            raise
+        except Exception as e:
+            logger.error('JSON view error: %s' % request.path, exc_info=True)
+            # Only expose the error itself while debugging - the traceback is
+            # in the log.
+            msg = _('Internal error')
+            if settings.DEBUG:
+                msg += ': ' + force_text(e)
+            response = {'result': 'error', 'sError': msg, 'text': msg}
+        return self.render_to_response(serializers.dumps(response))
+
+    def get_etag(self):
+        """
+        Return the ETag of the AJAX response, or None if the report doesn't
+        declare Meta.data_version. The tag covers the report's data version,
+        Report.cache_vary() (the user by default) and the request parameters
+        - except sEcho and jQuery's cache buster, which change every draw.
+        """
+        version = self.report.data_version()
+        if version is None:
+            return None
+        params = sorted((key, self.request.GET.getlist(key)) for key in self.request.GET.keys() if key not in ('sEcho', '_'))
+        return '"%s"' % caching.make_key(self.report.cache_namespace(), version,
+                                         self.report.cache_vary(), params)
+
     def ordering(self, qs):
         request = self.request
         # Number of columns that are used in sorting
@@ -59,13 +137,104 @@ class DatatableView(BaseDatatableView, AjaxMixin, FileDownloadView):
             i_sorting_cols = 0
         
         if i_sorting_cols != 0:
-            return BaseDatatableView.ordering(self, qs)
+            qs = BaseDatatableView.ordering(self, qs)
         elif hasattr(self.report._meta, 'sorting'):
             order = self.report._meta.sorting
-            return qs.order_by(*order)
-        else:
+            qs = qs.order_by(*order)
+
+        if self.report._meta.keyset:
+            # Keyset pagination needs a total ordering, so always finish with
+            # the unique key from Meta.sorting.
+            order_by = list(qs.query.order_by)
+            unique = self.report._meta.sorting[-1]
+            if unique.lstrip('-') not in [lookup.lstrip('-') for lookup in order_by if isinstance(lookup, basestring)]:
+                qs = qs.order_by(*(order_by + [unique]))
+        return qs
+
+    def get_prefetch_pages(self):
+        """
+        Return the number of pages the request wants in one go (iPrefetchPages),
+        between 1 and max_prefetch_pages.
+        """
+        try:
+            pages = int(self.request.GET.get('iPrefetchPages', 1))
+        except ValueError:
+            pages = 1
+        return min(max(pages, 1), self.max_prefetch_pages)
+
+    def get_page_bounds(self):
+        """
+        Return a tuple of (start, limit) for the requested page(s) - limit is
+        None if paging is disabled.
+        """
+        try:
+            limit = int(self.request.GET.get('iDisplayLength', 10))
+        except ValueError:
+            limit = 10
+        if limit == -1:
+            return 0, None
+        limit = min(limit, self.max_display_length) * self.get_prefetch_pages()
+        try:
+            start = max(int(self.request.GET.get('iDisplayStart', 0)), 0)
+        except ValueError:
+            start = 0
+        return start, limit
+
+    def paging(self, qs):
+        start, limit = self.get_page_bounds()
+        if limit is None:
             return qs
-        
+        if self.report._meta.keyset:
+            ordering = self.get_cursor_ordering(qs)
+            values = self.read_cursor(ordering, start)
+            if values is not None:
+                return qs.filter(seek_q(ordering, values))[:limit]
+        return qs[start:start + limit]
+
+    def get_cursor_ordering(self, qs):
+        """
+        Return the ordering of qs if pages can be seeked by it, otherwise None
+        (in which case pages are fetched with an OFFSET). seek_q never matches
+        nulls, so every lookup must be a non null column of the model.
+        """
+        if get_keyset_ordering(qs) is None:
+            return None
+        return get_ordering(qs)
+
+    def get_cursor_salt(self):
+        return 'django_datatables.keyset.%s' % self.report.cache_namespace()
+
+    def make_cursor(self, ordering, start, item):
+        """
+        Return a token for the page starting at start, which follows item.
+        Returns None if the item's sort key can't be used (ie.. it's null).
+        """
+        values = [json_safe(lookup_value(item, lookup.lstrip('-'))) for lookup in ordering]
+        if None in values:
+            return None
+        filters = [list(term) for term in self.get_filter_signature()]
+        return signing.dumps({'start': start, 'ordering': ordering, 'filters': filters, 'values': values},
+                             salt=self.get_cursor_salt())
+
+    def read_cursor(self, ordering, start):
+        """
+        Return the sort key values of the request's cursor (sCursor) if it is
+        for the page starting at start with the same ordering and filters,
+        otherwise None
+        (in which case the page is fetched with an OFFSET).
+        """
+        token = self.request.GET.get('sCursor', None)
+        if not token or ordering is None:
+            return None
+        try:
+            cursor = signing.loads(token, salt=self.get_cursor_salt())
+        except signing.BadSignature:
+            return None
+        filters = [list(term) for term in self.get_filter_signature()]
+        if cursor.get('start') != start or cursor.get('ordering') != ordering or cursor.get('filters') != filters:
+            return None
+        return cursor.get('values')
+
     def save_state(self, request):
         """Save the state (ie.. ordering, searched fields etc..) of the datatable."""
         if 'state_uri' in request.GET:
@@ -78,17 +247,31 @@ class DatatableView(BaseDatatableView, AjaxMixin, FileDownloadView):
 
     def csv(self, request, *args, **kwargs):
         """
-        Send csv download to client.
+        Send csv download to client - gzip encoded if csv_gzip is set and the
+        client accepts it.
         """
         from django_datatables.writers.csv_writers import UnicodeCsvWriter
         self.initialize(*args, **kwargs)
         qs = self.get_initial_queryset(*args, **kwargs)
         qs = self.filter_queryset(qs)
-        self.csv_handle = cStringIO.StringIO()
         writer = UnicodeCsvWriter(self.report, qs)
-        writer.write(self.csv_handle)
-        self.csv_handle.reset()
-        return FileDownloadView.render_to_response(self, {})
+        encode = self.csv_gzip and accepts_gzip(request)
+        if self.csv_streaming:
+            chunks = writer.iter_csv()
+            response = StreamingHttpResponse(gzip_iter(chunks) if encode else chunks, content_type=self.content_type())
+            response['Content-Disposition'] = 'attachment; filename="%s"' % self.filename()
+        else:
+            self.csv_handle = cStringIO.StringIO()
+            output = CompressedWriter(self.csv_handle, 'gzip' if encode else None)
+            writer.write(output)
+            output.close()
+            self.csv_handle.reset()
+            response = FileDownloadView.render_to_response(self, {})
+        if self.csv_gzip:
+            patch_vary_headers(response, ('Accept-Encoding', ))
+        if encode:
+            response['Content-Encoding'] = 'gzip'
+        return response
     
     def filename(self):
         return '%s-%s.csv' % (slugify(u'%s' % self.report.__module__.replace('.', '-')), datetime.now().strftime('%Y%m%d%H%M%S'))
@@ -116,34 +299,78 @@ class DatatableView(BaseDatatableView, AjaxMixin, FileDownloadView):
         return self.request.path
 
     def has_aggregates(self):
-        for field in self.report.fields():
-            if field.aggregate:
-                return True
-        return False
+        return self.report.has_aggregates()
 
     def get_aggregates(self, **kwargs):
-        aggregate_kwargs = {}
-        for field in self.report.fields():
-            if field.aggregate:
-                aggregate_kwargs[field.name] = field.aggregate
-        
-        if aggregate_kwargs:
-            qs = self.filter_queryset(self.get_initial_queryset(**kwargs)).aggregate(**aggregate_kwargs)
-            aggregates = []
-            for field in self.report.fields():
-                if field.aggregate:
-                    aggregates.append(field.__class__().to_python(qs[field.name]))
-                else:
-                    aggregates.append(None)
+        if self.report.has_aggregates():
+            qs = self.get_initial_queryset(**kwargs)
+            cache_key = self.get_aggregates_cache_key(qs)
+            if cache_key:
+                aggregates = cache.get(cache_key)
+                if aggregates is not None:
+                    return aggregates
+            aggregates = self.format_aggregates(aggregate(self.report, self.filter_queryset(qs)))
+            if cache_key:
+                cache.set(cache_key, aggregates, self.report._meta.aggregate_cache)
             return aggregates
 
+    def format_aggregates(self, aggregates):
+        """
+        Return aggregates ({field name: aggregate}) as a list in field order.
+        """
+        return [field.__class__().to_python(aggregates.get(field.name)) if field.aggregate else None
+                for field in self.report.fields()]
+
+    def get_filter_signature(self):
+        """
+        Return the search terms of the request in a normalized form - two
+        requests with the same signature filter the report in the same way
+        regardless of paging, ordering or column order.
+        """
+        signature = []
+        sSearch = self.request.GET.get('sSearch', None)
+        if sSearch:
+            signature.append(('', sSearch))
+        sColumns = self.request.GET.get('sColumns', None)
+        if sColumns:
+            for i, field_name in enumerate(sColumns.split(',')):
+                term = self.request.GET.get('sSearch_%s' % i, None)
+                if term:
+                    signature.append((field_name, term))
+        return tuple(sorted(signature))
+
+    def get_aggregates_cache_key(self, qs):
+        """
+        Return the cache key for the aggregates of qs filtered by the request,
+        or None if Meta.aggregate_cache isn't set. The key includes the SQL of
+        the unfiltered queryset, so per user querysets are cached separately.
+        """
+        if not self.report._meta.aggregate_cache:
+            return None
+        try:
+            sql = caching.query_signature(qs)
+        except EmptyResultSet:
+            # Can't match anything - not worth caching.
+            return None
+        return caching.make_key('%s-aggregates' % self.report.cache_namespace(),
+                                self.report.cache_version(), self.get_filter_signature(), sql)
+
     def get_context_data(self, **kwargs):
         self.initialize(**kwargs)
         if self.is_ajax() or self.accepts_json():
             # Return the data via ajax, rather than the table itself.
-            context = BaseDatatableView.get_context_data(self, **kwargs)
-            if self.has_aggregates():
-                context['aggregates'] = self.get_aggregates(**kwargs) 
+            snapshot = self.get_snapshot()
+            if snapshot is not None:
+                context = self.get_snapshot_context_data(snapshot)
+            else:
+                context = self.get_ajax_context_data(**kwargs)
+                if self.has_aggregates():
+                    context['aggregates'] = self.get_aggregates(**kwargs) 
+            if self.get_results_format() == 'columnar':
+                # The rows are in columns - jquery.dataTables.Compact.js
+                # expands them back into aaData.
+                context['oColumnar'] = context['aaData']
+                context['aaData'] = []
             return context
         context = super(TemplateView, self).get_context_data(**kwargs)
         context.update(report_json_context_helper(self.report, 
@@ -154,6 +381,112 @@ class DatatableView(BaseDatatableView, AjaxMixin, FileDownloadView):
                                                   self.get_tabletools()))
         return context
 
+    def get_ajax_context_data(self, **kwargs):
+        """
+        Build the datatables payload for an AJAX draw - as per
+        BaseDatatableView.get_context_data() but counting with the count
+        strategy and skipping the second count when nothing was filtered.
+        """
+        qs = self.get_initial_queryset()
+        total_records, total_exact = self.count_records(qs, False)
+        filtered = self.filter_queryset(qs)
+        if filtered is qs:
+            total_display_records, display_exact = total_records, total_exact
+        else:
+            total_display_records, display_exact = self.count_records(filtered, True)
+        qs = self.ordering(filtered)
+        page = self.paging(qs)
+        context = {
+            'sEcho': int(self.request.GET.get('sEcho', 0)),
+            'iTotalRecords': total_records,
+            'iTotalDisplayRecords': total_display_records,
+            'aaData': self.prepare_results(page),
+        }
+        if self.report._meta.keyset and not self.results_cache_hit:
+            # Hand back a cursor for the next page - page has already been
+            # evaluated by prepare_results so this doesn't query again. Pages
+            # served from the results cache weren't, so get no cursor.
+            ordering = self.get_cursor_ordering(qs)
+            items = list(page)
+            start, limit = self.get_page_bounds()
+            if ordering and items and limit:
+                cursor = self.make_cursor(ordering, start + limit, items[-1])
+                if cursor:
+                    context['sNextCursor'] = cursor
+        if not total_exact:
+            context['bApproximateTotalRecords'] = True
+        if not display_exact:
+            context['bApproximateTotalDisplayRecords'] = True
+        return context
+
+    def get_snapshot(self):
+        """
+        Return the Snapshot to serve the report from, or None to query the
+        database as usual.
+        """
+        if not self.serve_snapshots or not self.report._meta.materialize:
+            return None
+        return load_snapshot(self.report)
+
+    def get_snapshot_context_data(self, snapshot):
+        """
+        As per get_ajax_context_data() but filtering, ordering and paging the
+        rows of snapshot rather than querying the database.
+        """
+        column_terms = []
+        sColumns = self.request.GET.get('sColumns', None)
+        if sColumns:
+            for i, field_name in enumerate(sColumns.split(',')):
+                term = self.request.GET.get('sSearch_%s' % i, None)
+                field = self.descriptor.field(field_name)
+                if term and field is not None:
+                    column_terms.append((field, term))
+        rows = snapshot.filter(self.report, self.request.GET.get('sSearch', None), column_terms)
+        filtered = rows is not snapshot.rows
+
+        fields = self.report.fields()
+        ordering = []
+        try:
+            i_sorting_cols = int(self.request.GET.get('iSortingCols', 0))
+        except ValueError:
+            i_sorting_cols = 0
+        for i in range(i_sorting_cols):
+            try:
+                field = fields[int(self.request.GET.get('iSortCol_%s' % i))]
+            except (TypeError, ValueError, IndexError):
+                continue
+            ordering.append((field.name, self.request.GET.get('sSortDir_%s' % i) == 'desc'))
+        if not ordering:
+            names = [field.name for field in fields]
+            ordering = [(name.lstrip('-'), name.startswith('-')) for name in getattr(self.report._meta, 'sorting', None) or ()
+                        if name.lstrip('-') in names]
+        if ordering:
+            rows = snapshot.order(self.report, rows, ordering)
+
+        start, limit = self.get_page_bounds()
+        page = rows[start:start + limit] if limit else rows[start:]
+        context = {
+            'sEcho': int(self.request.GET.get('sEcho', 0)),
+            'iTotalRecords': len(snapshot.rows),
+            'iTotalDisplayRecords': len(rows),
+            # The writer annotates the rows it renders, so don't hand it the shared ones.
+            'aaData': self.prepare_results([dict(row) for row in page]),
+        }
+        if self.has_aggregates():
+            aggregates = aggregate(self.report, rows) if filtered else snapshot.aggregates or {}
+            context['aggregates'] = self.format_aggregates(aggregates)
+        return context
+
+    def get_count_strategy(self):
+        strategy = self.count_strategy or self.report._meta.count or ExactCount
+        return strategy() if isinstance(strategy, type) else strategy
+
+    def count_records(self, qs, filtered):
+        """
+        Count qs with the count strategy, returning a tuple of (count, exact).
+        """
+        return self.get_count_strategy().count(self, qs, filtered)
+
     def get_create_url(self):
         return None
     
@@ -168,12 +501,12 @@ class DatatableView(BaseDatatableView, AjaxMixin, FileDownloadView):
 
     @property
     def order_columns(self):
-        return [field.sorting_with for field in self.report.fields()]
+        return self.descriptor.order_columns
 
     def get_initial_queryset(self, *args, **kwargs):
         # return queryset used as base for futher sorting/filtering
         # these are simply objects displayed in datatable
-        return self.report.queryset()
+        return self.report.prepare_queryset(self.report.queryset())
 
     def filter_queryset(self, qs):
         """
@@ -182,10 +515,7 @@ class DatatableView(BaseDatatableView, AjaxMixin, FileDownloadView):
         # First process the all fields search
         sSearch = self.request.GET.get('sSearch', None)
         
-        qs_params = self.report.get_qs_for_term(sSearch)
-
-        if qs_params:
-            qs = qs.filter(qs_params)
+        qs = self.report.search(qs, sSearch)
 
         # Now process the column search for each column
         sColumns = self.request.GET.get('sColumns', None)
@@ -194,18 +524,55 @@ class DatatableView(BaseDatatableView, AjaxMixin, FileDownloadView):
             for i, field_name in enumerate(sColumns):
                 term = self.request.GET.get('sSearch_%s' % i, None)
                 if term:
-                    qs_params = self.report.field(field_name).get_qs_for_term(term, True)
-                    if qs_params:
-                        qs = qs.filter(qs_params)
+                    qs = self.descriptor.field(field_name).filter_queryset(qs, term, True)
         
         return qs
 
     def prepare_results(self, qs):
         # prepare list with output column data
         # queryset is already paginated here
-        if settings.DEBUG:
+        if settings.DEBUG and hasattr(qs, 'query'):
             logger.debug(qs.query)
-        return JsonWriter(self.report).as_json(qs)
+        self.results_cache_hit = False
+        cache_key = self.get_results_cache_key(qs)
+        if cache_key:
+            results = cache.get(cache_key)
+            self.report.cache_hit(results is not None)
+            if results is not None:
+                self.results_cache_hit = True
+                return results
+        if self.get_results_format() == 'columnar':
+            results = JsonWriter(self.report).as_columnar(qs)
+        else:
+            results = JsonWriter(self.report).as_json(qs)
+        if cache_key:
+            cache.set(cache_key, results, self.report._meta.cache.seconds)
+        return results
+
+    def get_results_format(self):
+        """
+        Return the format the request wants the rows in - 'columnar' for the
+        compact format (sFormat=columnar, see HtmlWriter.as_columnar) or None
+        for the usual rendered rows.
+        """
+        return 'columnar' if self.request.GET.get('sFormat', None) == 'columnar' else None
+
+    def get_results_cache_key(self, qs):
+        """
+        Return the cache key for the rendered page qs, or None if Meta.cache
+        isn't set. The key is built from the report's module path, its cache
+        version, Report.cache_vary() (the user by default) and the SQL of the
+        page - which covers the filters, ordering and paging.
+        """
+        if not self.report._meta.cache or not hasattr(qs, 'query'):
+            return None
+        try:
+            sql = caching.query_signature(qs)
+        except EmptyResultSet:
+            # Can't match anything - not worth caching.
+            return None
+        return self.report.cache_key('results', self.report.cache_version(), self.report.cache_vary(),
+                                     self.get_filter_signature(), self.get_results_format(), sql)
 
 
 class GetDatatableStateView(DetailView):
@@ -1,4 +1,5 @@
 import os
+import threading
 from django.utils.html import format_html
 from django.utils.encoding import force_text, smart_text
 try:
@@ -21,9 +22,20 @@ from django.template import Context, Template
 from itertools import chain
 from django.utils.timesince import timesince
 
+# Separates each item's tip when data tips are rendered in a batch.
+DATA_TIP_SEPARATOR = u'\x1e'
+
+# Per thread state for data tip rendering - a reusable Context and any data
+# tips rendered up front by Widget.prepare_data_tips().
+_data_tip_state = threading.local()
+
 class Widget(six.with_metaclass(MediaDefiningClass)):
     css = 'widget'
     is_localized = False
+    # The client side renderer (see jquery.dataTables.Compact.js) that
+    # reproduces the render() of the class it is declared on - subclasses
+    # that override render() without declaring one are rendered server side.
+    client_type = None
     
     def __init__(self, field, attrs=None):
         self.field = field
@@ -31,6 +43,57 @@ class Widget(six.with_metaclass(MediaDefiningClass)):
             self.attrs = attrs.copy()
         else:
             self.attrs = {}
+        self._data_tip_templates = {}
+
+    def has_data_tip_template(self):
+        """
+        Return True if this widget's data tip is a django template.
+        """
+        return '{' in self.attrs.get('data_tip', '')
+
+    def get_data_tip_template(self, tip, batch=False):
+        """
+        Return the compiled template for tip, compiling it only once. A batch
+        template renders the tip for each of {{ objects }} in one go.
+        """
+        key = (tip, batch)
+        if key not in self._data_tip_templates:
+            if batch:
+                source = u'{%% for object in objects %%}%s%s{%% endfor %%}' % (tip, DATA_TIP_SEPARATOR)
+            else:
+                source = tip
+            self._data_tip_templates[key] = Template(source)
+        return self._data_tip_templates[key]
+
+    def render_data_tip(self, tip, item):
+        """
+        Render the data tip template for item.
+        """
+        prepared = getattr(_data_tip_state, 'prepared', {}).get(id(self))
+        if prepared is not None and id(item) in prepared:
+            return prepared[id(item)]
+        context = getattr(_data_tip_state, 'context', None)
+        if context is None:
+            context = _data_tip_state.context = Context()
+        with context.push(object=item):
+            return self.get_data_tip_template(tip).render(context)
+
+    def prepare_data_tips(self, items):
+        """
+        Render the data tips for all of items with a single template render,
+        they are then used by build_attrs() until clear_data_tips() is called.
+        """
+        if not self.has_data_tip_template():
+            return
+        items = list(items)
+        template = self.get_data_tip_template(self.attrs['data_tip'], batch=True)
+        tips = template.render(Context({'objects': items})).split(DATA_TIP_SEPARATOR)
+        if not hasattr(_data_tip_state, 'prepared'):
+            _data_tip_state.prepared = {}
+        _data_tip_state.prepared[id(self)] = dict(zip([id(item) for item in items], tips))
+
+    def clear_data_tips(self):
+        getattr(_data_tip_state, 'prepared', {}).pop(id(self), None)
 
     def render_title(self, writer, field, attrs=None):
         """
@@ -38,6 +101,30 @@ class Widget(six.with_metaclass(MediaDefiningClass)):
         """
         raise NotImplementedError
 
+    def get_client_type(self):
+        for klass in type(self).__mro__:
+            if 'render' in klass.__dict__:
+                return klass.__dict__.get('client_type')
+        return None
+
+    def client_renderer(self, name):
+        """
+        Return a description of how the client renders this widget's values
+        (see client_value) for the compact format, or None if it can't -
+        in which case the values are rendered server side as usual.
+        """
+        client_type = self.get_client_type()
+        if client_type is None or self.has_data_tip_template():
+            return None
+        attrs = self.build_attrs(base_css=self.css, extra_css=(name.replace('_', '-'),))
+        return {'sType': client_type, 'oAttrs': attrs}
+
+    def client_value(self, report, value, item):
+        """
+        Return the raw value the client renderer renders.
+        """
+        return value
+
     def render(self, report, writer, name, value, item, row_number, attrs=None, **kwargs):
         """
         Returns this Widget rendered as HTML, as a Unicode string.
@@ -52,9 +139,7 @@ class Widget(six.with_metaclass(MediaDefiningClass)):
             attrs['data-tip'] = attrs['data_tip']
             del(attrs['data_tip'])
             if '{' in attrs['data-tip']:
-                t = Template(attrs['data-tip'])
-                c = Context({'object': item})
-                attrs['data-tip'] = t.render(c)
+                attrs['data-tip'] = self.render_data_tip(attrs['data-tip'], item)
         if data:
             for key, value in data.items():
                 attrs['data-%s' % key.replace('_', '-')] = value
@@ -81,6 +166,28 @@ class Widget(six.with_metaclass(MediaDefiningClass)):
 
 class TextWidget(Widget):
     css = 'widget-text'
+    client_type = 'text'
+
+    def client_renderer(self, name):
+        renderer = super(TextWidget, self).client_renderer(name)
+        if renderer is not None and self.field.choices:
+            renderer['oChoices'] = dict((force_text(key), force_text(label)) for key, label in self.field.flatchoices)
+        return renderer
+
+    def client_value(self, report, value, item):
+        """
+        Return the raw value, or [raw, formatted] when formatting changes it
+        (choices are formatted by the client).
+        """
+        if value is None:
+            value = u''
+        if callable(value):
+            value = value()
+        raw = force_text(value)
+        if self.field.choices:
+            return raw
+        formatted = force_text(self._format_value(value, item))
+        return raw if formatted == raw else [raw, formatted]
 
     def _format_value(self, value, item):
         if self.field.choices:
@@ -127,16 +234,27 @@ class DurationWidget(TextWidget):
 
 class BaseSpanWidget(TextWidget):
     span_base_class = ''
+    client_type = 'span'
 
-    def render(self, report, writer, name, value, item, row_number, attrs=None, **kwargs):
+    def client_renderer(self, name):
+        renderer = super(BaseSpanWidget, self).client_renderer(name)
+        if renderer is not None:
+            renderer['sSpanClass'] = self.span_base_class
+            if self.field.data_tip_icon and renderer['oAttrs'].get('data-tip'):
+                renderer['sTipIcon'] = self.field.data_tip_icon
+        return renderer
+
+    def client_value(self, report, value, item):
+        """
+        Return [raw, formatted, label class].
+        """
         if value is None:
             value = u''
         if callable(value):
             value = value()
-        if not isinstance(writer, HtmlWriter):
-            return value
-        final_attrs = self.build_attrs(item=item, base_css=self.css, extra_css=(name.replace('_', '-'),))
-        # Now work out the label class
+        return [force_text(value), force_text(self._format_value(value, item)), force_text(self._get_extra_css(report, value, item))]
+
+    def _get_extra_css(self, report, value, item):
         extra_css = self.get_extra_css()
         if extra_css:
             if '__' in extra_css:
@@ -155,6 +273,18 @@ class BaseSpanWidget(TextWidget):
                 extra_css = getattr(report, extra_css)
                 if callable(extra_css):
                     extra_css = extra_css(value)
+        return extra_css
+
+    def render(self, report, writer, name, value, item, row_number, attrs=None, **kwargs):
+        if value is None:
+            value = u''
+        if callable(value):
+            value = value()
+        if not isinstance(writer, HtmlWriter):
+            return value
+        final_attrs = self.build_attrs(item=item, base_css=self.css, extra_css=(name.replace('_', '-'),))
+        # Now work out the label class
+        extra_css = self._get_extra_css(report, value, item)
         tip = ' <i class="%s"></i>' % self.field.data_tip_icon if self.field.data_tip_icon and final_attrs.get('data-tip') else ''
         return format_html(u'<span{0} data-raw="{1}"><span class="{2} {3}">{4}</span>{5}</span>', 
                            flatatt(final_attrs), 
@@ -221,6 +351,16 @@ class UrlWidget(TextWidget):
     """
     css = 'widget-url'
     target = '_blank'
+    client_type = 'url'
+
+    def client_renderer(self, name):
+        renderer = super(UrlWidget, self).client_renderer(name)
+        if renderer is not None:
+            renderer['sTarget'] = self.target
+        return renderer
+
+    def client_value(self, report, value, item):
+        return None if value is None else force_text(value)
 
     def render(self, report, writer, name, value, item, row_number, attrs=None, **kwargs):
         if not isinstance(writer, HtmlWriter):
@@ -260,6 +400,21 @@ class ForeignKeyWidget(UrlWidget):
     @todo: Write rendering function.
     """
     css = 'widget-foreign-key'
+    client_type = 'link'
+
+    def client_value(self, report, value, item):
+        """
+        Return [text, url] or [text, url, append markup] - an empty text for
+        no related object.
+        """
+        if not isinstance(value, models.Model) and value != None:
+            raise Exception("ForeignKeyWidget expects value to be an instance of Model not %s" % (value))
+        if value is None:
+            return [u'', None]
+        url = value.get_absolute_url() if 'get_absolute_url' in dir(value) else None
+        if hasattr(value, 'get_append_markup'):
+            return [force_text(value), url, force_text(value.get_append_markup())]
+        return [force_text(value), url]
     
     def render(self, report, writer, name, value, item, row_number, attrs=None, is_self=False, **kwargs):
         final_attrs = self.build_attrs(item=item, base_css=self.css, extra_css=(name.replace('_', '-'),))
@@ -1,16 +1,200 @@
 from django.utils import formats
 from django.utils.functional import curry
+from django_datatables.aggregates import Aggregator
+from django_datatables.utils import iter_queryset
 
 class BaseWriter(object):
     is_localized = False
+    # The number of rows fetched from the database at a time when iterating,
+    # None for settings.DATATABLES_CHUNK_SIZE.
+    chunk_size = None
     
     def __init__(self, report, qs=None):
         self.report = report
         if qs is None:
             qs = report.queryset()
-        self.qs = qs
+        self.qs = report.prepare_queryset(qs)
+        self.aggregator = None
     
     def _format_value(self, value):
         if self.is_localized:
             return formats.localize_input(value)
-        return value
\ No newline at end of file
+        return value
+
+    def iter_items(self):
+        """
+        Iterate over the items in self.qs a chunk at a time, so they aren't
+        kept alive in the queryset's result cache for the life of the writer
+        - see django_datatables.utils.iter_queryset.
+        """
+        return iter_queryset(self.qs, self.chunk_size)
+
+    def iter_cells(self, items=None, render_kwargs={}, ignore_missing_pre_process=False, aggregate=False):
+        """
+        The row pipeline every writer shares - generate (item, cells) for
+        each of items (self.iter_items() by default) where cells is a list of
+        (column, rendered value) tuples in field order.
+
+        Items are iterated once. With aggregate the report's aggregates are
+        accumulated in the same pass, see aggregates().
+        """
+        if items is None:
+            items = self.iter_items()
+        self.aggregator = Aggregator.for_report(self.report) if aggregate else None
+        cells = RowPlan.for_report(self.report).bind(self.report, self, render_kwargs,
+                                                     ignore_missing_pre_process, self.aggregator)
+        report = self.report
+        row_number = 0
+        for item in items:
+            if isinstance(item, dict):
+                item['_report'] = report
+            else:
+                item._report = report
+            yield item, [(column, cell(item, row_number)) for column, cell in cells]
+            row_number += 1
+
+    def aggregates(self):
+        """
+        Return a dict of {field name: aggregate} - accumulated by the last
+        iter_cells(aggregate=True) pass when it could be, otherwise from the
+        report (ie.. aggregates only the database can do).
+        """
+        if self.aggregator is not None:
+            return self.aggregator.results()
+        return self.report.get_aggregates()
+
+class RowPlan(object):
+    """
+    Everything about rendering a row that only depends on the report class:
+    the column each field renders into and how row ids/classes are found.
+
+    A plan is built once per report class (see RowPlan.for_report) and bound
+    to a writer with bind(), so the per cell work is a flat list of closures.
+    """
+    def __init__(self, report_class):
+        from django_datatables.fields import FormsetField
+        self.columns = []
+        self.width = 0
+        for field in report_class._meta.fields:
+            if isinstance(field, FormsetField):
+                # FormsetField is a hidden field, it's put in the first column.
+                self.columns.append((0, field))
+            else:
+                self.columns.append((self.width, field))
+                self.width += 1
+        self.report_row_class = hasattr(report_class, 'get_row_class')
+        self._row_strategies = {}
+
+    @classmethod
+    def for_report(cls, report):
+        """
+        Return the (cached) plan for the class of report.
+        """
+        if report._meta.row_plan is None:
+            report._meta.row_plan = cls(report.__class__)
+        return report._meta.row_plan
+
+    def bind(self, report, writer, render_kwargs={}, ignore_missing_pre_process=False, aggregator=None):
+        """
+        Return a list of (column, cell) tuples in field order where
+        cell(item, row_number) returns the rendered value of the field.
+
+        pre_process_with/post_process_with callbacks are looked up on report
+        once here rather than for every cell. If aggregator is given the
+        cells of aggregate fields add their values to it as they render, so
+        aggregates are accumulated in the same pass as the rows.
+        """
+        cells = []
+        for column, field in self.columns:
+            pre_process = self._resolve_callbacks(report, field.pre_process_with, ignore_missing_pre_process)
+            post_process = self._resolve_callbacks(report, field.post_process_with)
+            accumulator = aggregator.get_accumulator(field) if aggregator is not None else None
+            cells.append((column, self._cell(report, writer, field, pre_process, post_process, render_kwargs, accumulator)))
+        return cells
+
+    def bind_client(self, report, writer, render_kwargs={}):
+        """
+        As per bind() but for the compact format - returns a list of
+        (column, renderer, cell) tuples in field order where renderer is the
+        widget's client renderer and cell(item, row_number) returns the raw
+        value for it. Fields the client can't render (no client renderer or
+        post_process_with callbacks) have a renderer of None and cells that
+        return the HTML rendered by bind().
+        """
+        bound = []
+        for (column, field), (_, html_cell) in zip(self.columns, self.bind(report, writer, render_kwargs)):
+            renderer = None if field.post_process_with else field.widget.client_renderer(field.name)
+            if renderer is None:
+                bound.append((column, None, html_cell))
+            else:
+                pre_process = self._resolve_callbacks(report, field.pre_process_with)
+                bound.append((column, renderer, self._client_cell(report, field, pre_process)))
+        return bound
+
+    def _client_cell(self, report, field, pre_process):
+        traverse = field.traverse_for_value
+        prepare = field.prepare_value
+        client_value = field.widget.client_value
+
+        def cell(item, row_number):
+            value = prepare(traverse(item))
+            for callback in pre_process:
+                value = callback(value, item)
+            return client_value(report, value, item)
+        return cell
+
+    def _resolve_callbacks(self, report, callbacks, ignore_missing=False):
+        resolved = []
+        for callback in callbacks or ():
+            if isinstance(callback, basestring):
+                if ignore_missing and not hasattr(report, callback):
+                    continue
+                callback = getattr(report, callback)
+            resolved.append(callback)
+        return resolved
+
+    def _cell(self, report, writer, field, pre_process, post_process, render_kwargs, accumulator=None):
+        name = field.name
+        traverse = field.traverse_for_value
+        prepare = field.prepare_value
+        render = field.widget.render
+        accumulate = accumulator.add if accumulator is not None else None
+
+        def cell(item, row_number):
+            value = traverse(item)
+            if accumulate is not None:
+                if callable(value):
+                    value = value()
+                accumulate(value)
+            value = prepare(value)
+            for callback in pre_process:
+                value = callback(value, item)
+            rendered = render(report, writer, name, value, item, row_number, **render_kwargs)
+            for callback in post_process:
+                rendered = callback(rendered, item)
+            return rendered
+        return cell
+
+    def row_strategies(self, item):
+        """
+        Return a tuple of (row_id, row_class) callables for items of the same
+        type as item - either may be None. They are called with (report, item).
+        """
+        item_class = item.__class__
+        if item_class not in self._row_strategies:
+            if hasattr(item, 'get_row_id'):
+                row_id = lambda report, item: item.get_row_id()
+            elif hasattr(item, 'pk'):
+                row_id = lambda report, item: "row-%s" % item.pk
+            elif isinstance(item, dict):
+                row_id = lambda report, item: "row-%s" % item['pk'] if 'pk' in item else None
+            else:
+                row_id = None
+            if hasattr(item, 'get_row_class'):
+                row_class = lambda report, item: item.get_row_class()
+            elif self.report_row_class:
+                row_class = lambda report, item: report.get_row_class(item)
+            else:
+                row_class = None
+            self._row_strategies[item_class] = (row_id, row_class)
+        return self._row_strategies[item_class]
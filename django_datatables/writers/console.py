@@ -6,24 +6,22 @@ class ConsoleWriter(BaseWriter):
     
     def write(self):
         """
-        Write the csv to path
+        Render the report as a console table, with a row of aggregates if the
+        report has any. Rows and aggregates come from a single pass over the
+        queryset.
         
-        @param path: The file path to write the csv to.
-        @return UnicodeWriter: The UnicodeWriter instance used to write the csv.
+        @return ConsoleTable: The table of the report.
         """
         rows = []
-        for item in self.report.queryset():
-            row = []
-            for field in self.report.fields():
-                row.append(field.widget.render(self, field.name, field.traverse_for_value(item), item))
-            rows.append(row)
+        for item, cells in self.iter_cells(ignore_missing_pre_process=True, aggregate=True):
+            rows.append([value for column, value in cells])
 
         if self.report.has_aggregates():
             rows.append(None)
-            aggregates = self.report.get_aggregates()
+            aggregates = self.aggregates()
             row = []
             for field in self.report.fields():
                 row.append( (aggregates[field.name] if field.aggregate else '') )
             rows.append(row)
 
-        return ConsoleTable(self.report.titles(), rows) 
\ No newline at end of file
+        return ConsoleTable(self.report.titles(), rows)
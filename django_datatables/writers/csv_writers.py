@@ -2,46 +2,75 @@ import csv, logging
 from django_datatables.writers.base import BaseWriter
 from django_toolkit.csv.unicode import UnicodeWriter
 
+class RowBuffer(object):
+    """
+    A file like object that holds on to everything written to it until pop()
+    is called - used to turn UnicodeWriter output into a generator.
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    def pop(self):
+        data = ''.join(self.chunks)
+        self.chunks = []
+        return data
+
 class UnicodeCsvWriter(BaseWriter):
+
+    def iter_rows(self, totals=False, header=True):
+        """
+        Generate the rows of the csv, starting with the titles.
+        
+        @param header: Whether to start with the titles.
+        @param totals: Whether to end with a row of the report's aggregates,
+                       accumulated while the rows are generated.
+        @return generator: Each row as a list of unicode strings.
+        """
+        if header:
+            yield self.report.titles()
+        for item, cells in self.iter_cells(ignore_missing_pre_process=True, aggregate=totals):
+            yield [u"%s" % value for column, value in cells]
+        if totals and self.report.has_aggregates():
+            aggregates = self.aggregates()
+            yield [u"%s" % aggregates[field.name] if field.aggregate and aggregates[field.name] is not None else u''
+                   for field in self.report.fields()]
+
+    def iter_csv(self, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL, totals=False, header=True):
+        """
+        Generate the encoded csv a row at a time, ie.. for a StreamingHttpResponse.
+        
+        @return generator: Each row as an encoded csv line.
+        """
+        buffer = RowBuffer()
+        writer = UnicodeWriter(buffer, delimiter=delimiter, quotechar=quotechar, quoting=quoting)
+        for row in self.iter_rows(totals=totals, header=header):
+            try:
+                writer.writerow(row)
+            except UnicodeDecodeError as e:
+                e.reason += ' - for row: %s' % ', '.join(row)
+                raise e
+            yield buffer.pop()
     
-    def write(self, f, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL):
+    def write(self, f, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL, totals=False, header=True):
         """
         Write the csv to path
         
         @param f: Either a file like object or a file path
-        @return UnicodeWriter: The UnicodeWriter instance used to write the csv.
+        @param totals: Whether to end with a row of the report's aggregates.
+        @param header: Whether to start with a row of titles.
         """
-        if not hasattr(f, 'read'):
+        if not hasattr(f, 'write'):
             handle = open(f, 'wb')
         else:
             handle = f
         
-        writer = UnicodeWriter(handle, delimiter=delimiter, quotechar=quotechar, quoting=quoting)
-        writer.writerow(self.report.titles())
         try:
-            row_number = 0
-            for item in self.qs:
-                row = []
-                for field in self.report.fields():
-                    value = field.prepare_value(field.traverse_for_value(item))
-                    if field.pre_process_with:
-                        for callback in field.pre_process_with:
-                            if hasattr(self.report, callback):
-                                value = getattr(self.report, callback)(value, item)
-                    rendered = field.widget.render(self.report, self, field.name, value, item, row_number)
-                    if field.post_process_with:
-                        for callback in field.post_process_with:
-                            try:
-                                callback = getattr(self.report, callback)
-                            except TypeError: pass
-                            rendered = callback(rendered, item)
-                    row.append(u"%s" % rendered)
-                writer.writerow(row)
-                row_number += 1
-        except UnicodeDecodeError as e:
-            e.reason += ' - for row: %s' % ', '.join(row)
-            raise e
+            for data in self.iter_csv(delimiter=delimiter, quotechar=quotechar, quoting=quoting, totals=totals, header=header):
+                handle.write(data)
         finally:
             if handle != f:
                 # If we opened the file, close it.
-                handle.close()
\ No newline at end of file
+                handle.close()
@@ -1,7 +1,7 @@
 from __future__ import absolute_import
 
 import csv, logging, json
-from django_datatables.writers.base import BaseWriter
+from django_datatables.writers.base import BaseWriter, RowPlan
 from django.utils.safestring import mark_safe
 from django.utils import formats
 from django.utils.text import slugify
@@ -13,7 +13,6 @@ except ImportError: # Django < 1.9 compatibility
 from django.utils.html import format_html
 from django_datatables_view.mixins import DTEncoder
 from django.forms.widgets import Select
-from collections import OrderedDict
 
 class HtmlWriter(BaseWriter):
     """
@@ -60,7 +59,7 @@ class HtmlWriter(BaseWriter):
         return mark_safe("\n".join(ths))
 
     def has_filters(self):
-        return len([field for field in self.report.fields() if field.filter]) > 0
+        return len(self.report._meta.filter_fields) > 0
     
     def filters(self):
         from django_datatables.fields import FormsetField
@@ -85,7 +84,7 @@ class HtmlWriter(BaseWriter):
         return mark_safe("\n".join(ths))
     
     def has_aggregates(self):
-        return len([field for field in self.report.fields() if field.aggregate]) > 0
+        return len(self.report._meta.aggregate_fields) > 0
     
     def aggregates(self):
         ths = []
@@ -99,53 +98,85 @@ class HtmlWriter(BaseWriter):
         return mark_safe("\n".join(ths))
     
     def as_json(self, items, render_kwargs={}):
-        from django_datatables.fields import FormsetField
-        
-        jsons = []
+        return self._with_data_tips(self._as_json, items, render_kwargs)
+
+    def as_columnar(self, items, render_kwargs={}):
+        """
+        Render items in the compact, columnar format - a dict with:
+
+        - aoColumns: for each field, the column it renders into and the
+          renderer the client formats its values with (None if the values
+          are HTML rendered here).
+        - aaColumnData: for each field, the list of its values.
+        - asRowId/asRowClass: the row ids/classes, if the rows have them.
+
+        jquery.dataTables.Compact.js expands it back into aaData.
+        """
+        return self._with_data_tips(self._as_columnar, items, render_kwargs)
+
+    def _with_data_tips(self, render, items, render_kwargs):
+        if not self.report._meta.batch_data_tips:
+            return render(items, render_kwargs)
+        # Render each templated data tip for the whole page in one go.
+        items = list(items)
+        widgets = [field.widget for field in self.report.fields() if field.widget.has_data_tip_template()]
+        for widget in widgets:
+            widget.prepare_data_tips(items)
+        try:
+            return render(items, render_kwargs)
+        finally:
+            for widget in widgets:
+                widget.clear_data_tips()
+
+    def _as_columnar(self, items, render_kwargs={}):
+        plan = RowPlan.for_report(self.report)
+        cells = plan.bind_client(self.report, self, render_kwargs)
+        data = [[] for cell in cells]
+        row_ids, row_classes = [], []
         row_number = 0
         for item in items:
             if isinstance(item, dict):
                 item['_report'] = self.report
             else:
                 item._report = self.report
-            json = OrderedDict()
-            
-            if 'get_row_id' in dir(item):
-                json['DT_RowId'] = item.get_row_id()
-            elif hasattr(item, 'pk'):
-                json['DT_RowId'] = "row-%s" % item.pk
+            row_id, row_class = plan.row_strategies(item)
+            row_ids.append(row_id(self.report, item) if row_id is not None else None)
+            row_classes.append(row_class(self.report, item) if row_class is not None else None)
+            for values, (column, renderer, cell) in zip(data, cells):
+                values.append(cell(item, row_number))
+            row_number += 1
+        columnar = {
+            'aoColumns': [{'iColumn': column, 'oRenderer': renderer} for column, renderer, cell in cells],
+            'aaColumnData': data,
+        }
+        if any(value is not None for value in row_ids):
+            columnar['asRowId'] = row_ids
+        if any(value is not None for value in row_classes):
+            columnar['asRowClass'] = row_classes
+        return columnar
 
-            if 'get_row_class' in dir(item):
-                json['DT_RowClass'] = item.get_row_class()
-            elif 'get_row_class' in dir(self.report):
-                json['DT_RowClass'] = self.report.get_row_class(item)
+    def _as_json(self, items, render_kwargs={}):
+        plan = RowPlan.for_report(self.report)
+        width = plan.width
+        
+        jsons = []
+        for item, cells in self.iter_cells(items, render_kwargs):
+            json = {}
             
-            field_number = 0
-            for field in self.report.fields():
-                value = field.prepare_value(field.traverse_for_value(item))
-                if field.pre_process_with:
-                    for callback in field.pre_process_with:
-                        try:
-                            callback = getattr(self.report, callback)
-                        except TypeError: pass
-                        value = callback(value, item)
-                rendered = field.widget.render(self.report, self, field.name, value, item, row_number, **render_kwargs)
-                if field.post_process_with:
-                    for callback in field.post_process_with:
-                        try:
-                            callback = getattr(self.report, callback)
-                        except TypeError: pass
-                        rendered = callback(rendered, item)
-                if field_number not in json:
-                    json[field_number] = ''
-                if isinstance(field, FormsetField):
-                    # FormsetField is a hidden field, just put it in the first field in the table.
-                    json[0] += rendered
-                else:
-                    json[field_number] += rendered
-                    field_number += 1
+            row_id, row_class = plan.row_strategies(item)
+            if row_id is not None:
+                value = row_id(self.report, item)
+                if value is not None:
+                    json['DT_RowId'] = value
+            if row_class is not None:
+                json['DT_RowClass'] = row_class(self.report, item)
+            
+            columns = [''] * width
+            for column, rendered in cells:
+                columns[column] += rendered
+            for column, rendered in enumerate(columns):
+                json[column] = rendered
             jsons.append(json)
-            row_number += 1
         return jsons
     
     def as_table(self, items, render_kwargs={}):
@@ -161,8 +192,8 @@ class HtmlWriter(BaseWriter):
                 attrs['class'] = row['DT_RowClass']
                 del row['DT_RowClass']
             tr = []
-            for column in row.values():
-                tr.append('<td>%s</td>' % column)
+            for column in sorted(row):
+                tr.append('<td>%s</td>' % row[column])
 
             output.append("<tr %s>%s</tr>\n" % (
                 " ".join(['%s="%s"' % (key, value) for key,value in attrs.iteritems()]), 